@@ -0,0 +1,233 @@
+from derive import DEFAULT_BITS, Keyring
+from prbg import DEFAULT_VERSION, VERSIONS
+from pkcs1 import KEYSTORE_FORMATS, KeystoreWriter, export_der, pem
+from rsagen import save_keys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+
+
+def main():
+    '''
+    This application derives many RSA key pairs in a single invocation. Each line of the input (a JSONL
+    file, or stdin) is a derivation job: {"name": NAME, "pwd": PWD, "cs": CS, "ic": IC, "bits": BITS,
+    "index": I, "version": V} (bits, index and version are optional, and select the key size, the key
+    of the keyring and the version of the generator, v1 by default; the version is kept in the result
+    lines and keystore records). The
+    jobs are read as they are needed and run on a pool of worker processes, with at most --max-pending
+    jobs submitted at once, and a result line is written for each job as it finishes (or in the input
+    order, with --ordered). The keys are saved as PEM files in --out-dir (with a <name>_meta.json
+    metadata file holding the version), appended to a --keystore, or
+    else included (PEM encoded) in the result lines. With --timeout, jobs that take longer are stopped
+    and reported as failed. With --results, the result lines are appended to the given file, and with
+    --resume, the jobs already completed in it are skipped.
+    '''
+
+    # Argument parser
+    parser = argparse.ArgumentParser(description='Deterministic RSA key generation (D-RSA): batch derivation')
+    parser.add_argument('input', type=str, nargs='?', default='-', help='JSONL file with the jobs (default: stdin)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    parser.add_argument('--max-pending', type=int, help='jobs submitted but not yet written at once (default: 2 per worker)')
+    parser.add_argument('--ordered', action='store_true', help='write the results in the input order')
+    parser.add_argument('--timeout', type=float, help='maximum time of each job in seconds')
+    parser.add_argument('--results', type=str, help='file where the result lines are appended (default: stdout)')
+    parser.add_argument('--resume', action='store_true', help='skip the jobs already completed in the --results file')
+    parser.add_argument('--out-dir', type=str, help='folder where the keys are saved as <name>_pub_key.pem and <name>_priv_key.pem')
+    parser.add_argument('--keystore', type=str, help='keystore file where the keys are appended')
+    parser.add_argument('--keystore-format', choices=KEYSTORE_FORMATS, default='jsonl', help='format of the keystore (default: jsonl)')
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be positive")
+    if args.resume and args.results is None:
+        parser.error("--resume requires --results")
+    if args.out_dir is not None and args.keystore is not None:
+        parser.error("--out-dir and --keystore are mutually exclusive")
+    max_pending = args.max_pending if args.max_pending is not None else 2 * args.jobs
+    if max_pending < 1:
+        parser.error("--max-pending must be positive")
+
+    completed = set()
+    if args.resume and os.path.exists(args.results):
+        completed = read_completed(args.results)
+
+    input_file = sys.stdin if args.input == '-' else open(args.input, "r")
+    results_file = sys.stdout if args.results is None else open(args.results, "a")
+    keystore = KeystoreWriter(args.keystore, args.keystore_format) if args.keystore is not None else None
+
+    def write(result, keys):
+        # Keys first, so that a job is only reported as completed once its keys are saved
+        if keys is not None:
+            publicKeyDer, privateKeyDer = keys
+            if keystore is not None:
+                keystore.add_der(result['name'], publicKeyDer, privateKeyDer, result['version'])
+                keystore.flush()
+            elif args.out_dir is not None:
+                save_keys(os.path.join(args.out_dir, result['name']), pem(publicKeyDer, "RSA PUBLIC KEY"), pem(privateKeyDer, "RSA PRIVATE KEY"), {'version': result['version']})
+            else:
+                result['public'] = pem(publicKeyDer, "RSA PUBLIC KEY").decode()
+                result['private'] = pem(privateKeyDer, "RSA PRIVATE KEY").decode()
+        results_file.write(json.dumps(result) + '\n')
+        results_file.flush()
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            summary = run_batch(read_jobs(input_file, completed), executor, write, max_pending, args.ordered, args.timeout)
+    finally:
+        if keystore is not None:
+            keystore.close()
+        if results_file is not sys.stdout:
+            results_file.close()
+        if input_file is not sys.stdin:
+            input_file.close()
+
+    print(f"{summary['completed']} jobs completed, {summary['failed']} failed, {summary['skipped']} skipped", file=sys.stderr)
+    if summary['failed']:
+        sys.exit(1)
+
+
+def read_completed(path):
+    '''
+    Reads the names of the jobs completed successfully in a results file.
+    '''
+    completed = set()
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # The last line may be truncated, if a previous run was interrupted while writing it
+                continue
+            if result.get('ok'):
+                completed.add(result['name'])
+    return completed
+
+
+def read_jobs(file, completed=()):
+    '''
+    Reads the jobs of a JSONL file, one at a time. Yields the job (a dict with the name, password,
+    confusion string, iteration count, key size, index and generator version), None for the jobs whose names are in
+    completed, or a result with the error of an invalid line.
+    '''
+    for number, line in enumerate(file, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+            if not isinstance(entry, dict):
+                raise ValueError("the job must be a JSON object")
+            job = {
+                'name': str(entry['name']),
+                'pwd': str(entry['pwd']),
+                'cs': str(entry['cs']),
+                'ic': str(entry['ic']),
+                'bits': int(entry.get('bits', DEFAULT_BITS)),
+                'index': int(entry.get('index', 0)),
+                'version': str(entry.get('version', DEFAULT_VERSION))
+            }
+            if job['version'] not in VERSIONS:
+                raise ValueError(f"unknown generator version {job['version']!r}, expected one of {VERSIONS}")
+        except KeyError as e:
+            yield {'name': f"line {number}", 'ok': False, 'error': f"missing field: {e.args[0]}"}
+            continue
+        except (ValueError, TypeError) as e:
+            yield {'name': f"line {number}", 'ok': False, 'error': str(e)}
+            continue
+        yield None if job['name'] in completed else job
+
+
+def run_batch(jobs, executor, write, max_pending, ordered=False, timeout=None):
+    '''
+    Runs the jobs (as yielded by read_jobs) on the executor, with at most max_pending jobs submitted
+    and not yet written at once: the next job is only read when there is room for it. Each result is
+    passed to write(result, keys), with the DER encoded keys (or None if the job failed), as soon as
+    it is available, or in the input order. Returns the number of completed, failed and skipped jobs.
+    '''
+    summary = {'completed': 0, 'failed': 0, 'skipped': 0}
+    pending = {}
+    finished = {}
+    next_position = 0
+
+    def emit(position, outcome):
+        nonlocal next_position
+        finished[position] = outcome
+        while finished:
+            if ordered:
+                if next_position not in finished:
+                    break
+                position = next_position
+                next_position += 1
+            else:
+                position = next(iter(finished))
+            outcome = finished.pop(position)
+            if outcome is not None:
+                result, keys = outcome
+                summary['completed' if result['ok'] else 'failed'] += 1
+                write(result, keys)
+
+    def collect(block):
+        done, _ = wait(pending, return_when=FIRST_COMPLETED, timeout=None if block else 0)
+        for future in done:
+            position, name = pending.pop(future)
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = ({'name': name, 'ok': False, 'error': repr(e)}, None)
+            emit(position, outcome)
+
+    for position, job in enumerate(jobs):
+        if job is None:
+            summary['skipped'] += 1
+            emit(position, None)
+            continue
+        if 'ok' in job:
+            emit(position, (job, None))
+            continue
+        while len(pending) + len(finished) >= max_pending:
+            collect(block=True)
+        pending[executor.submit(derive_job, job, timeout)] = (position, job['name'])
+        collect(block=False)
+    while pending:
+        collect(block=True)
+    return summary
+
+
+def derive_job(job, timeout=None):
+    '''
+    Worker of the batch: derives the key pair of a job, and returns its result and DER encoded keys.
+    With a timeout (in seconds), the job is interrupted with SIGALRM if it takes longer.
+    '''
+    start_time = time.perf_counter()
+    result = {'name': job['name'], 'ok': False, 'version': job['version']}
+    keys = None
+    if timeout is not None:
+        signal.signal(signal.SIGALRM, _timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        keyring = Keyring(job['pwd'], job['cs'], job['ic'], job['bits'], version=job['version'])
+        keys = export_der(keyring.drsa(job['index']))
+        result['ok'] = True
+    except TimeoutError:
+        result['error'] = f"timed out after {timeout}s"
+    except (ValueError, AssertionError) as e:
+        result['error'] = str(e) or type(e).__name__
+    finally:
+        if timeout is not None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    result['time'] = time.perf_counter() - start_time
+    return result, keys
+
+
+def _timeout(signum, frame):
+    '''
+    SIGALRM handler of the job timeouts.
+    '''
+    raise TimeoutError()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+from prbg import PRBG
+from drsa import DRSA
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import string
+import subprocess
+import sys
+import time
+
+'''
+Default grid of the setup benchmark: confusion string sizes and iteration counts.
+'''
+CS_SIZES = (1, 2, 3)
+ITERATION_COUNTS = (1, 5, 10, 20, 50, 100, 200)
+
+'''
+Fields of each cell of the benchmark results, in the order used by the CSV output.
+'''
+FIELDS = ('cs_size', 'ic', 'repetitions', 'median', 'p95', 'min', 'max', 'bytes_searched', 'bytes_per_second')
+
+'''
+Startup benchmark: commands of the generation path that are timed (run from the folder of this module),
+the modules that must not be imported by them, and the default time budget (in seconds) of each one.
+'''
+STARTUP_COMMANDS = {
+    'python': ['-c', 'pass'],
+    'import randgen': ['-c', 'import randgen'],
+    'import rsagen': ['-c', 'import rsagen'],
+    'import derive': ['-c', 'import derive'],
+    'randgen --nob 512': ['randgen.py', '--pwd', 'startup', '--cs', 's', '--ic', '1', '--nob', '512']
+}
+HEAVY_MODULES = ('numpy', 'matplotlib', 'PIL', 'rsa', 'concurrent.futures')
+STARTUP_BUDGET = 0.25
+
+
+def main():
+    '''
+    This application benchmarks the setup of the PRBG.
+    Each cell of the grid (confusion string size, iteration count) is set up a number of times with
+    passwords and confusion strings drawn from a fixed seed, so that two runs measure the same setups.
+    The samples are spread over a pool of worker processes, and the median and 95th percentile of the
+    setup time, as well as the bytes searched, are reported per cell as JSON and/or CSV. The results
+    can be compared with a baseline JSON file, in which case the program fails if any cell regressed.
+    With --crt, the private key operations of DRSA (CRT) are benchmarked against the rsa library instead.
+    With --startup, the start time of the generation path is measured instead (see STARTUP_COMMANDS),
+    and the program fails if any command is over the --budget, or if importing randgen, rsagen or
+    derive loads any of the HEAVY_MODULES.
+    '''
+
+    # Argument parser
+    parser = argparse.ArgumentParser(description='Deterministic RSA key generation (D-RSA): PRBG setup benchmark')
+    parser.add_argument('--cs-sizes', type=int, nargs='+', default=list(CS_SIZES), help='confusion string sizes')
+    parser.add_argument('--ic', type=int, nargs='+', default=list(ITERATION_COUNTS), help='iteration counts')
+    parser.add_argument('--repetitions', type=int, default=3, help='setups per cell (default: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random passwords and confusion strings')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    parser.add_argument('--json', type=str, help='file where the results are saved as JSON')
+    parser.add_argument('--csv', type=str, help='file where the results are saved as CSV')
+    parser.add_argument('--baseline', type=str, help='JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative increase of the median (default: 0.2)')
+    parser.add_argument('--crt', action='store_true', help='benchmark the private key operations instead of the setup')
+    parser.add_argument('--bits', type=int, default=4096, help='key size of the --crt benchmark (default: 4096)')
+    parser.add_argument('--count', type=int, default=50, help='operations per method of the --crt benchmark (default: 50)')
+    parser.add_argument('--startup', action='store_true', help='benchmark the start time of the generation path instead of the setup')
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET, help=f'time budget of each --startup command in seconds (default: {STARTUP_BUDGET})')
+    args = parser.parse_args()
+
+    if args.startup:
+        results = run_startup_benchmark(args.repetitions)
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        failures = check_startup(results, args.budget)
+        for failure in failures:
+            print(f"startup: {failure}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+        return
+
+    if args.crt:
+        json.dump(run_crt_benchmark(args.bits, args.count, args.seed), sys.stdout, indent=2)
+        print()
+        return
+
+    cells = run_benchmark(args.cs_sizes, args.ic, args.repetitions, args.seed, args.jobs)
+    if args.json is not None:
+        write_json(args.json, cells)
+    if args.csv is not None:
+        write_csv(args.csv, cells)
+    if args.json is None and args.csv is None:
+        json.dump(cells, sys.stdout, indent=2)
+        print()
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(cells, baseline, args.tolerance)
+        for cell, base in regressions:
+            print(f"regression: cs_size={cell['cs_size']} ic={cell['ic']} median {base['median']:.4f}s -> {cell['median']:.4f}s", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+def run_benchmark(cs_sizes=CS_SIZES, iteration_counts=ITERATION_COUNTS, repetitions=3, seed=0, jobs=None):
+    '''
+    Runs the given number of setups for each (confusion string size, iteration count) cell on a pool
+    of worker processes, and returns the summary of each cell.
+    '''
+    tasks = [
+        (cs_size, ic, repetition, seed)
+        for cs_size in cs_sizes
+        for ic in iteration_counts
+        for repetition in range(repetitions)
+    ]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        samples = list(executor.map(run_setup, *zip(*tasks)))
+    return summarize(samples)
+
+
+def run_setup(cs_size, ic, repetition, seed):
+    '''
+    Sets up a PRBG for one sample of a cell. The password and confusion string only depend on the
+    seed, the cell and the repetition index.
+    '''
+    rng = random.Random(f"{seed}:{cs_size}:{ic}:{repetition}")
+    prbg = PRBG(get_random_string(10, rng), get_random_string(cs_size, rng), ic)
+    start_time = time.perf_counter()
+    prbg.setup()
+    tot_time = time.perf_counter() - start_time
+    return {'cs_size': cs_size, 'ic': ic, 'time': tot_time, 'bytes_searched': prbg.bytes_searched}
+
+
+def summarize(samples):
+    '''
+    Groups the samples by cell and computes the statistics of each cell.
+    '''
+    groups = {}
+    for sample in samples:
+        groups.setdefault((sample['cs_size'], sample['ic']), []).append(sample)
+
+    cells = []
+    for (cs_size, ic), group in groups.items():
+        times = [sample['time'] for sample in group]
+        searched = sum(sample['bytes_searched'] for sample in group)
+        cells.append({
+            'cs_size': cs_size,
+            'ic': ic,
+            'repetitions': len(group),
+            'median': statistics.median(times),
+            'p95': percentile(times, 95),
+            'min': min(times),
+            'max': max(times),
+            'bytes_searched': searched // len(group),
+            'bytes_per_second': searched / sum(times) if sum(times) > 0 else 0.0
+        })
+    return cells
+
+
+def percentile(values, q):
+    '''
+    Computes the q-th percentile of the values, interpolating linearly between the closest ranks.
+    '''
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def compare(cells, baseline, tolerance=0.2):
+    '''
+    Compares the cells with the ones of a baseline, and returns the (cell, baseline cell) pairs whose
+    median setup time increased by more than the given relative tolerance.
+    '''
+    base_cells = {(cell['cs_size'], cell['ic']): cell for cell in baseline}
+    regressions = []
+    for cell in cells:
+        base = base_cells.get((cell['cs_size'], cell['ic']))
+        if base is not None and cell['median'] > base['median'] * (1 + tolerance):
+            regressions.append((cell, base))
+    return regressions
+
+
+def write_json(path, cells):
+    '''
+    Saves the benchmark results as a JSON list of cells.
+    '''
+    with open(path, "w") as f:
+        json.dump(cells, f, indent=2)
+        f.write("\n")
+
+
+def write_csv(path, cells):
+    '''
+    Saves the benchmark results as CSV, one row per cell.
+    '''
+    with open(path, "w", newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(cells)
+
+
+def plot_times(cells, folder):
+    '''
+    Plots the median setup time per iteration count (for each confusion string size) and per
+    confusion string size (for each iteration count) to the given folder.
+    '''
+    import matplotlib.pyplot as plt
+
+    for cs_size in sorted({cell['cs_size'] for cell in cells}):
+        data_cs = [(cell['ic'], cell['median']) for cell in cells if cell['cs_size'] == cs_size]
+        fig, ax = plt.subplots( nrows=1, ncols=1 )
+        ax.set_title(f"Time per iteration, for confusion string size={cs_size}")
+        ax.set_ylabel("Time (seconds)")
+        ax.set_xlabel("Iteration count")
+        ax.scatter([tpl[0] for tpl in data_cs], [tpl[1] for tpl in data_cs])
+        fig.savefig(f'{folder}/t_per_ic_cs{cs_size}.png')
+        plt.close(fig)
+
+    for ic in sorted({cell['ic'] for cell in cells}):
+        data_ic = [(cell['cs_size'], cell['median']) for cell in cells if cell['ic'] == ic]
+        fig, ax = plt.subplots( nrows=1, ncols=1 )
+        ax.set_title(f"Time per confusion string size, for iteration count={ic}")
+        ax.set_ylabel("Time (seconds)")
+        ax.set_xlabel("Confusion string size")
+        ax.scatter([tpl[0] for tpl in data_ic], [tpl[1] for tpl in data_ic])
+        fig.savefig(f'{folder}/t_per_cs_ic{ic}.png')
+        plt.close(fig)
+
+
+def run_crt_benchmark(bits=4096, count=50, seed=0):
+    '''
+    Measures the private key operations (operations per second) on a key of the given size: the rsa
+    library without CRT (rsa.core.decrypt_int) and with CRT and blinding (PrivateKey.blinded_decrypt),
+    and DRSA.decrypt and DRSA.decrypt_many (CRT with gmpy2).
+    '''
+    import rsa
+
+    rng = random.Random(seed)
+    my_rsa = DRSA(bytes(rng.getrandbits(8) for _ in range(bits // 8)))
+    n, e, d, p, q = (int(x) for x in my_rsa.get_private_params())
+    private_key = rsa.PrivateKey(n, e, d, p, q)
+    ciphertexts = [rng.randrange(n) for _ in range(count)]
+
+    methods = {
+        'rsa_decrypt_int': lambda: [rsa.core.decrypt_int(c, d, n) for c in ciphertexts],
+        'rsa_blinded_decrypt': lambda: [private_key.blinded_decrypt(c) for c in ciphertexts],
+        'drsa_decrypt': lambda: [my_rsa.decrypt(c) for c in ciphertexts],
+        'drsa_decrypt_many': lambda: my_rsa.decrypt_many(ciphertexts)
+    }
+    results = {'bits': bits, 'count': count}
+    expected = None
+    for name, method in methods.items():
+        start_time = time.perf_counter()
+        plaintexts = [int(m) for m in method()]
+        results[name] = count / (time.perf_counter() - start_time)
+        if expected is not None and plaintexts != expected:
+            raise AssertionError(f"{name} disagrees with rsa_decrypt_int")
+        expected = plaintexts
+    return results
+
+
+def run_startup_benchmark(repetitions=3):
+    '''
+    Runs each of the STARTUP_COMMANDS in a new interpreter the given number of times, and returns the
+    median wall time of each one, as well as the HEAVY_MODULES loaded by the imports.
+    '''
+    folder = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, command in STARTUP_COMMANDS.items():
+        times = []
+        for _ in range(repetitions):
+            start_time = time.perf_counter()
+            subprocess.run([sys.executable] + command, cwd=folder, stdout=subprocess.DEVNULL, check=True)
+            times.append(time.perf_counter() - start_time)
+        results[name] = {'median': statistics.median(times), 'min': min(times)}
+        if name.startswith('import '):
+            check = f"{command[1]}; import sys; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+            output = subprocess.run([sys.executable, '-c', check], cwd=folder, capture_output=True, text=True, check=True)
+            results[name]['heavy_modules'] = output.stdout.split()
+    return results
+
+
+def check_startup(results, budget=STARTUP_BUDGET):
+    '''
+    Checks the results of the startup benchmark, returning the list of failures: commands whose median
+    time is over the budget, and imports that load heavy modules.
+    '''
+    failures = []
+    for name, result in results.items():
+        if result['median'] > budget:
+            failures.append(f"{name} took {result['median']:.3f}s (budget: {budget:.3f}s)")
+        if result.get('heavy_modules'):
+            failures.append(f"{name} loads {', '.join(result['heavy_modules'])}")
+    return failures
+
+
+def get_random_string(length, rng=random):
+    '''
+    Produces a random alphabetic string with the given length, using the given random generator.
+    '''
+    letters = string.ascii_lowercase
+    return ''.join(rng.choice(letters) for i in range(length))
+
+
+if __name__ == "__main__":
+    main()
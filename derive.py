@@ -0,0 +1,142 @@
+from prbg import DEFAULT_VERSION, VERSIONS, PRBG, PRBGStream, SetupStats
+from drsa import DRSA, PrimeStats
+from pkcs1 import KEYSTORE_FORMATS, KeystoreWriter, export_pem
+from rsagen import save_keys
+import argparse
+import json
+import sys
+import threading
+
+'''
+Default size (in bits) of the derived keys, which takes 512 pseudo-random bytes (as in the README).
+'''
+DEFAULT_BITS = 4096
+
+
+def main():
+    '''
+    This application derives a deterministic RSA key pair from a password, a confusion string and an
+    iteration count in a single process, without piping the output of randgen into rsagen. The keys
+    are saved to the same files, and are byte-identical to the ones produced by:
+    randgen.py --pwd PWD --cs CS --ic IC --nob BITS/8 | rsagen.py KN
+    With --index and --count, other keys of the keyring of the same parameters are derived (all of
+    them from a single setup), and saved with the key name KN_<index>.
+    With --keystore, the keys are appended to a single keystore file (see pkcs1.KeystoreWriter) under
+    their key names, instead of being saved to two files each. The version of the generator (see
+    prbg.GENERATORS), selected with --generator (v1 by default), is recorded in the keystore records,
+    or else in the metadata file <key name>_meta.json next to the PEM files.
+    With --stats, the instrumentation of the setup and of the prime searches is printed to stderr as JSON.
+    '''
+
+    # Argument parser
+    parser = argparse.ArgumentParser(description='Deterministic RSA key generation (D-RSA): derive')
+    parser.add_argument('kn', type=str, help='key name')
+    parser.add_argument('--pwd', required=True, type=str, help='password (textual)')
+    parser.add_argument('--cs', required=True, type=str, help='confusion string (textual)')
+    parser.add_argument('--ic', required=True, type=str, help='iteration count (number)')
+    parser.add_argument('--bits', type=int, default=DEFAULT_BITS, help=f'key size in bits, a multiple of 16 (default: {DEFAULT_BITS})')
+    parser.add_argument('--generator', choices=VERSIONS, default=DEFAULT_VERSION, help=f'version of the generator (default: {DEFAULT_VERSION})')
+    parser.add_argument('--parallel', action='store_true', help='search for the primes p and q concurrently')
+    parser.add_argument('--index', type=int, help='index of the (first) key of the keyring to derive')
+    parser.add_argument('--count', type=int, default=1, help='number of consecutive keys of the keyring to derive (default: 1)')
+    parser.add_argument('--keystore', type=str, help='keystore file where the keys are appended, instead of PEM files')
+    parser.add_argument('--keystore-format', choices=KEYSTORE_FORMATS, default='jsonl', help='format of the keystore (default: jsonl)')
+    parser.add_argument('--stats', action='store_true', help='print the setup and prime search statistics to stderr')
+    args = parser.parse_args()
+    if args.bits <= 0 or args.bits % 16 != 0:
+        parser.error("--bits must be a positive multiple of 16")
+    if (args.index is not None and args.index < 0) or args.count < 1:
+        parser.error("--index must not be negative and --count must be positive")
+
+    setup_stats = SetupStats() if args.stats else None
+    prime_stats = PrimeStats() if args.stats else None
+    keyring = Keyring(args.pwd, args.cs, args.ic, args.bits, stats=setup_stats, version=args.generator)
+    if args.index is None and args.count == 1:
+        keys = [(0, args.kn)]
+    else:
+        first = args.index if args.index is not None else 0
+        keys = [(index, f"{args.kn}_{index}") for index in range(first, first + args.count)]
+
+    if args.keystore is not None:
+        with KeystoreWriter(args.keystore, args.keystore_format) as keystore:
+            for index, key_name in keys:
+                keystore.add(key_name, keyring.drsa(index, parallel=args.parallel, stats=prime_stats), keyring.version)
+    else:
+        for index, key_name in keys:
+            publicKeyPkcs1PEM, privateKeyPkcs1PEM = keyring.keypair(index, parallel=args.parallel, stats=prime_stats)
+            metadata = {'version': keyring.version, 'bits': args.bits, 'index': index}
+            save_keys(key_name, publicKeyPkcs1PEM, privateKeyPkcs1PEM, metadata)
+    if args.stats:
+        json.dump({'version': keyring.version, 'setup': setup_stats.to_dict(), 'primes': prime_stats.to_dict()}, sys.stderr, indent=2)
+        print(file=sys.stderr)
+
+
+def derive_keypair(password, confusion_string, iteration_count, bits=DEFAULT_BITS, parallel=False, version=DEFAULT_VERSION):
+    '''
+    Derives a RSA key pair from the given password, confusion string and iteration count, and returns
+    the public and private keys in the PKCS#1 format, PEM encoded. The generator (of the given version)
+    is set up, and its next BITS/8 bytes are used as the seed of the DRSA module.
+    '''
+    return export_pem(derive_drsa(password, confusion_string, iteration_count, bits, parallel, version))
+
+
+def derive_drsa(password, confusion_string, iteration_count, bits=DEFAULT_BITS, parallel=False, version=DEFAULT_VERSION):
+    '''
+    Derives the DRSA instance of the given password, confusion string and iteration count.
+    '''
+    return Keyring(password, confusion_string, iteration_count, bits, version=version).drsa(0, parallel)
+
+
+class Keyring:
+    '''
+    Set of related keys derived from a single setup of the generator. Key #i is derived from the bytes
+    [i*BITS/8, (i+1)*BITS/8) of the stream that follows the setup, so key #0 is the key derived by
+    derive_keypair, and any key can be derived on demand without deriving the previous ones (the
+    stream jumps to its region).
+    '''
+
+    def __init__(self, password, confusion_string, iteration_count, bits=DEFAULT_BITS, cache=None, stats=None, version=DEFAULT_VERSION) -> None:
+        '''
+        Sets up the generator of the keyring (of the given version), which is the expensive part of the
+        derivation. If a prbg.SetupCache is given, the setup is taken from (or stored in) it. If a
+        prbg.SetupStats object is given, the setup is recorded in it.
+        '''
+        if bits <= 0 or bits % 16 != 0:
+            raise ValueError(f"the key size must be a positive multiple of 16 bits, got {bits}")
+        if cache is not None:
+            prbg = cache.setup(password, confusion_string, iteration_count, version=version, stats=stats)
+        else:
+            prbg = PRBG(password, confusion_string, iteration_count, version=version)
+            prbg.setup(stats=stats)
+        self.bits = bits
+        self.version = version
+        self.stream = PRBGStream(prbg)
+        self.lock = threading.Lock()
+
+    def seed(self, index):
+        '''
+        Retrieves the pseudo-random bytes of key #index.
+        '''
+        if index < 0:
+            raise ValueError(f"the key index must not be negative, got {index}")
+        nob = self.bits // 8
+        with self.lock:
+            self.stream.seek(index * nob)
+            return self.stream.read(nob)
+
+    def drsa(self, index, parallel=False, stats=None):
+        '''
+        Derives the DRSA instance of key #index (recording its prime searches in the given
+        drsa.PrimeStats object, if any).
+        '''
+        return DRSA(self.seed(index), parallel=parallel, stats=stats)
+
+    def keypair(self, index, parallel=False, stats=None):
+        '''
+        Derives key #index, and returns its public and private keys in the PKCS#1 format, PEM encoded.
+        '''
+        return export_pem(self.drsa(index, parallel, stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import gmpy2
 from gmpy2 import mpz
+from itertools import compress
+import time
 
 '''
 List of fixed prime numbers < 1000, in order to check that p and q will not be coprimes
@@ -25,6 +27,200 @@ small_primes = [
     mpz(947), mpz(953), mpz(967), mpz(971), mpz(977), mpz(983), mpz(991), mpz(997)
 ]
 
+'''
+Sieve used by next_prime: candidates are sieved in windows of SIEVE_WINDOW numbers against all the
+primes below SIEVE_LIMIT (computed on the first sieved search), and only the survivors are tested for
+primality. Below SIEVE_MIN_BITS, sieving costs more than it saves, and gmpy2.next_prime is used
+directly.
+'''
+SIEVE_LIMIT = 1 << 18
+SIEVE_WINDOW = 1 << 12
+SIEVE_MIN_BITS = 1024
+
+
+def _primes_below(limit):
+    '''
+    Computes the list of primes below the given limit with the sieve of Eratosthenes.
+    '''
+    sieve = bytearray([1]) * limit
+    sieve[0:2] = b'\x00\x00'
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytes(len(range(i*i, limit, i)))
+    return list(compress(range(limit), sieve))
+
+
+def _gmp_version():
+    '''
+    Retrieves the version of the GMP library used by gmpy2 as a tuple of ints, or None if gmpy2 was
+    built against another library (such as MPIR).
+    '''
+    name, _, version = gmpy2.mp_version().partition(' ')
+    if name != 'GMP':
+        return None
+    return tuple(int(part) for part in version.split('.') if part.isdigit())
+
+
+'''
+Whether next_prime sieves the candidates itself. Since GMP 6.3, mpz_nextprime (behind
+gmpy2.next_prime) sieves the candidates too, and is faster than this sieve, so it is only used with
+older versions of GMP.
+'''
+SIEVE_ENABLED = (_gmp_version() or (0,)) < (6, 3)
+
+_sieve_primes = None
+
+
+def sieve_primes():
+    '''
+    Retrieves the primes below SIEVE_LIMIT, computing them on the first call. Threads racing on the
+    first call compute the same list, so no lock is needed.
+    '''
+    global _sieve_primes
+    if _sieve_primes is None:
+        _sieve_primes = _primes_below(SIEVE_LIMIT)
+    return _sieve_primes
+
+'''
+Whether this gmpy2 version can release the GIL during long computations (such as powmod). It is
+released by find_prime, for executors given by the caller, but the primality tests (gmpy2.is_prime,
+gmpy2.next_prime) still hold it, so the default executor uses processes.
+'''
+RELEASES_GIL = hasattr(gmpy2.get_context(), 'allow_release_gil')
+
+
+def next_prime(n, stats=None):
+    '''
+    Finds the next (probable) prime greater than n, like gmpy2.next_prime, which it replaces. Windows
+    of candidates above n are sieved against the sieve_primes table, so the full primality test
+    (gmpy2.is_prime) only runs on candidates without small factors, in increasing order. The result
+    is the same prime as gmpy2.next_prime. Values below SIEVE_MIN_BITS bits, and all values if
+    SIEVE_ENABLED is false, are delegated to gmpy2.next_prime.
+
+    Survivors are first filtered with a base 2 Fermat test, which never rejects a prime (so the
+    result is unchanged), rejects composites at the cost of a single powmod, and releases the GIL
+    when the gmpy2 context allows it.
+
+    If a PrimeStats object is given, the search is counted in it, without changing how it is done.
+    The sieved windows and the candidates tested are only counted when next_prime sieves itself;
+    the searches delegated to gmpy2.next_prime are counted as such, as their candidates are not
+    visible from Python.
+    '''
+    n = mpz(n)
+    if stats is not None:
+        stats.searches += 1
+    if not SIEVE_ENABLED or n.bit_length() < SIEVE_MIN_BITS:
+        if stats is not None:
+            stats.delegated += 1
+        return gmpy2.next_prime(n)
+    primes = sieve_primes()
+    base = n + 1
+    while True:
+        if stats is not None:
+            stats.windows += 1
+        sieve = bytearray([1]) * SIEVE_WINDOW
+        for prime in primes:
+            start = -base % prime
+            if start < SIEVE_WINDOW:
+                sieve[start::prime] = bytes(len(range(start, SIEVE_WINDOW, prime)))
+        offset = sieve.find(1)
+        while offset >= 0:
+            candidate = base + offset
+            if stats is not None:
+                stats.candidates += 1
+            if gmpy2.powmod(2, candidate - 1, candidate) == 1 and gmpy2.is_prime(candidate):
+                return candidate
+            offset = sieve.find(1, offset + 1)
+        base += SIEVE_WINDOW
+
+
+def find_prime(number, stats=None):
+    '''
+    Finds the prime derived from one half of the seed: the next prime after the given number, bumped
+    to the following prime while it is divisible by any of the small_primes (checked in order). If a
+    PrimeStats object is given, the search is recorded in it.
+    '''
+    if stats is not None:
+        start_time = time.perf_counter()
+    if RELEASES_GIL:
+        # The gmpy2 context is local to the current thread
+        context = gmpy2.get_context()
+        allow_release_gil = context.allow_release_gil
+        context.allow_release_gil = True
+    try:
+        prime = next_prime(number, stats)
+        for small_prime in small_primes:
+            if gmpy2.t_mod(prime, small_prime) == 0:
+                if stats is not None:
+                    stats.bumps += 1
+                prime = next_prime(prime, stats)
+        return prime
+    finally:
+        if RELEASES_GIL:
+            context.allow_release_gil = allow_release_gil
+        if stats is not None:
+            stats.times.append(time.perf_counter() - start_time)
+
+
+def _find_prime_stats(number):
+    '''
+    Runs find_prime with its own PrimeStats (so that it can run on any executor), returning both.
+    '''
+    stats = PrimeStats()
+    return find_prime(number, stats), stats
+
+
+def prime_executor(max_workers=2):
+    '''
+    Creates the default executor to search for p and q concurrently: a process pool, since the
+    searches hold the GIL for most of their time (even with RELEASES_GIL), so threads don't run them
+    in parallel.
+    '''
+    # Only imported here, so that the sequential derivations don't pay for the import
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+
+class PrimeStats:
+    '''
+    Instrumentation of the prime searches of DRSA: the next_prime searches, the searches delegated to
+    gmpy2.next_prime, the sieved windows and candidates tested for primality by the other searches,
+    the small_primes bumps, and the time of each find_prime (in seconds).
+    '''
+
+    def __init__(self) -> None:
+        self.searches = 0
+        self.delegated = 0
+        self.windows = 0
+        self.candidates = 0
+        self.bumps = 0
+        self.times = []
+
+    def merge(self, other):
+        '''
+        Adds the counters of another PrimeStats object to this one.
+        '''
+        self.searches += other.searches
+        self.delegated += other.delegated
+        self.windows += other.windows
+        self.candidates += other.candidates
+        self.bumps += other.bumps
+        self.times += other.times
+
+    def to_dict(self):
+        '''
+        Retrieves the statistics as a dict (e.g. to be saved as JSON).
+        '''
+        return {
+            'searches': self.searches,
+            'delegated': self.delegated,
+            'windows': self.windows,
+            'candidates': self.candidates,
+            'bumps': self.bumps,
+            'times': self.times
+        }
+
 
 class DRSA:
     '''
@@ -32,12 +228,16 @@ class DRSA:
     pair from a N bytes pseudo-random seed.
     '''
     
-    def __init__(self, seed) -> None:
+    def __init__(self, seed, parallel=False, executor=None, stats=None) -> None:
         '''
         Generates the p and q primes from the given seed, which is cut in half and converted to two
         gmpy.mpz instances (similar to int/long type but significanly faster for large values). From these
         instances, the next prime is calculated and attributed to p qnd q after the small prime division
         verification. From p, q and the fixed public exponent e (2^16+1), all the other parameters are generated.
+
+        The two searches are independent: if an executor is given, or parallel is True (in which case
+        a prime_executor is used), p and q are searched for concurrently. The result is the same.
+        If a PrimeStats object is given, both searches are recorded in it.
         '''
 
         # Generate primes p and q from the given seed
@@ -47,14 +247,14 @@ class DRSA:
         big_number1 = gmpy2.mpz(int.from_bytes(seed1, byteorder='big'))
         big_number2 = gmpy2.mpz(int.from_bytes(seed2, byteorder='big'))
 
-        p = gmpy2.next_prime(big_number1)
-        q = gmpy2.next_prime(big_number2)
-
-        for small_prime in small_primes:
-            if gmpy2.t_mod(p, small_prime) == 0:
-                p = gmpy2.next_prime(p)
-            if gmpy2.t_mod(q, small_prime) == 0:
-                q = gmpy2.next_prime(q)
+        if executor is not None:
+            p, q = self._find_primes(executor, big_number1, big_number2, stats)
+        elif parallel:
+            with prime_executor() as executor:
+                p, q = self._find_primes(executor, big_number1, big_number2, stats)
+        else:
+            p = find_prime(big_number1, stats)
+            q = find_prime(big_number2, stats)
 
         self.p = p
         self.q = q
@@ -74,6 +274,27 @@ class DRSA:
         assert(self.d != 1)
         assert(gmpy2.t_mod(self.e*self.d, self.phi) == 1)
 
+        # CRT parameters, to compute the private key operations modulo p and q
+        self.dp = gmpy2.t_mod(self.d, self.p-1)
+        self.dq = gmpy2.t_mod(self.d, self.q-1)
+        self.qinv = gmpy2.invert(self.q, self.p)
+
+
+
+    def _find_primes(self, executor, big_number1, big_number2, stats=None):
+        '''
+        Searches for p and q concurrently with the given executor.
+        '''
+        if stats is None:
+            future_p = executor.submit(find_prime, big_number1)
+            future_q = executor.submit(find_prime, big_number2)
+            return future_p.result(), future_q.result()
+        future_p = executor.submit(_find_prime_stats, big_number1)
+        future_q = executor.submit(_find_prime_stats, big_number2)
+        (p, stats_p), (q, stats_q) = future_p.result(), future_q.result()
+        stats.merge(stats_p)
+        stats.merge(stats_q)
+        return p, q
 
 
     def get_private_params(self):
@@ -87,4 +308,72 @@ class DRSA:
         '''
         Retrieves the public parameters from the given DRSA instance (n, e).
         '''
-        return self.n, self.e
\ No newline at end of file
+        return self.n, self.e
+
+
+    def get_crt_params(self):
+        '''
+        Retrieves the CRT parameters from the given DRSA instance (dP, dQ, qInv).
+        '''
+        return self.dp, self.dq, self.qinv
+
+
+    def encrypt(self, message):
+        '''
+        Raw RSA public key operation (no padding): message^e mod n.
+        '''
+        return gmpy2.powmod(self._check(message), self.e, self.n)
+
+
+    def decrypt(self, ciphertext):
+        '''
+        Raw RSA private key operation (no padding): ciphertext^d mod n, computed with the CRT as two
+        exponentiations modulo p and q with half-size exponents, recombined with Garner's formula.
+        '''
+        c = self._check(ciphertext)
+        m1 = gmpy2.powmod(c, self.dp, self.p)
+        m2 = gmpy2.powmod(c, self.dq, self.q)
+        return self._combine(m1, m2)
+
+
+    def sign(self, message):
+        '''
+        Raw RSA signature (no padding or hashing): message^d mod n, computed with the CRT.
+        '''
+        return self.decrypt(message)
+
+
+    def decrypt_many(self, ciphertexts):
+        '''
+        Applies decrypt to a list of ciphertexts. The exponentiations modulo p and q are each done in
+        a single gmpy2 call (powmod_base_list).
+        '''
+        values = [self._check(c) for c in ciphertexts]
+        m1s = gmpy2.powmod_base_list(values, self.dp, self.p)
+        m2s = gmpy2.powmod_base_list(values, self.dq, self.q)
+        return [self._combine(m1, m2) for m1, m2 in zip(m1s, m2s)]
+
+
+    def sign_many(self, messages):
+        '''
+        Applies sign to a list of messages.
+        '''
+        return self.decrypt_many(messages)
+
+
+    def _combine(self, m1, m2):
+        '''
+        Recombines the results modulo p and q into the result modulo n.
+        '''
+        h = gmpy2.f_mod(self.qinv * (m1 - m2), self.p)
+        return m2 + h * self.q
+
+
+    def _check(self, value):
+        '''
+        Converts a value to mpz, checking that it is a valid input of the RSA operations (0 <= value < n).
+        '''
+        value = mpz(value)
+        if value < 0 or value >= self.n:
+            raise ValueError("the value must be in the range [0, n)")
+        return value
\ No newline at end of file
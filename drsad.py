@@ -0,0 +1,254 @@
+from derive import DEFAULT_BITS, Keyring
+from prbg import DEFAULT_VERSION, VERSIONS, SetupCache
+from benchmark import percentile
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+
+'''
+Default address of the daemon: a Unix socket if a path is given, or else localhost TCP on DEFAULT_PORT.
+'''
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+'''
+Number of recent request latencies kept for the latency statistics.
+'''
+LATENCY_WINDOW = 1000
+
+'''
+Setup cache of the current worker process (None if disabled), created by init_worker.
+'''
+_cache = None
+
+
+def main():
+    '''
+    This application is a long-running key derivation daemon, so that many processes can derive keys
+    without paying for the interpreter start and imports on each derivation. It listens on a Unix
+    socket (--socket) or on localhost TCP (--host and --port), and speaks JSON lines: each request is
+    a JSON object on one line, and is answered with one line.
+    - {"op": "derive", "pwd": PWD, "cs": CS, "ic": IC, "bits": BITS, "index": I, "version": V} derives
+      a key pair (bits, index and version are optional, and select the key size, the key of the
+      keyring and the version of the generator), answered with {"ok": true, "public": PEM,
+      "private": PEM, "version": V}.
+    - {"op": "stats"} is answered with the queue depth, request counters and latency percentiles.
+    Derivations (setup and prime search) run on a pool of worker processes, and concurrent identical
+    requests are coalesced onto a single derivation. With --cache-size N, each worker also keeps the
+    N most recently used setups in memory (see prbg.SetupCache). Errors are answered with
+    {"ok": false, "error": MSG}.
+    '''
+
+    # Argument parser
+    parser = argparse.ArgumentParser(description='Deterministic RSA key generation (D-RSA): derivation daemon')
+    parser.add_argument('--socket', type=str, help='path of the Unix socket to listen on')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help=f'TCP host to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'TCP port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    parser.add_argument('--cache-size', type=int, default=0, help='setups cached by each worker (default: 0, no cache)')
+    args = parser.parse_args()
+    if args.cache_size < 0:
+        parser.error("--cache-size must not be negative")
+
+    try:
+        asyncio.run(serve(args.socket, args.host, args.port, args.jobs, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+async def serve(path=None, host=DEFAULT_HOST, port=DEFAULT_PORT, jobs=None, cache_size=0):
+    '''
+    Runs the daemon until it is cancelled.
+    '''
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(cache_size,)) as executor:
+        daemon = Daemon(executor)
+        if path is not None:
+            server = await asyncio.start_unix_server(daemon.handle, path=path)
+        else:
+            server = await asyncio.start_server(daemon.handle, host=host, port=port)
+        async with server:
+            await server.serve_forever()
+
+
+def init_worker(cache_size):
+    '''
+    Initializes a worker process, creating its setup cache if cache_size > 0.
+    '''
+    global _cache
+    _cache = SetupCache(cache_size) if cache_size > 0 else None
+
+
+def derive(password, confusion_string, iteration_count, bits=DEFAULT_BITS, index=0, version=DEFAULT_VERSION):
+    '''
+    Worker of the daemon: derives key #index of the keyring of the given parameters, and returns the
+    PEM encoded public and private keys as text.
+    '''
+    keyring = Keyring(password, confusion_string, iteration_count, bits, cache=_cache, version=version)
+    publicKeyPkcs1PEM, privateKeyPkcs1PEM = keyring.keypair(index)
+    return publicKeyPkcs1PEM.decode(), privateKeyPkcs1PEM.decode()
+
+
+class Daemon:
+    '''
+    Request handler of the daemon. The derivations in flight are kept by their parameters, so that an
+    identical request that arrives while one is being computed waits for the same result.
+    '''
+
+    def __init__(self, executor) -> None:
+        '''
+        Initializes the handler with the executor where the derivations run.
+        '''
+        self.executor = executor
+        self.in_flight = {}
+        self.requests = 0
+        self.derivations = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    async def handle(self, reader, writer):
+        '''
+        Serves the requests of one connection, one JSON object per line, until it is closed.
+        '''
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.dispatch(line)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, line):
+        '''
+        Answers one request line.
+        '''
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("the request must be a JSON object")
+            op = request.get('op')
+            if op == 'stats':
+                return {'ok': True, 'stats': self.stats()}
+            if op != 'derive':
+                raise ValueError(f"unknown operation: {op!r}")
+            version = str(request.get('version', DEFAULT_VERSION))
+            if version not in VERSIONS:
+                raise ValueError(f"unknown generator version {version!r}, expected one of {VERSIONS}")
+            bits = int(request.get('bits', DEFAULT_BITS))
+            if bits <= 0 or bits % 16 != 0:
+                raise ValueError(f"the key size must be a positive multiple of 16 bits, got {bits}")
+            public, private = await self.derive(
+                str(request['pwd']), str(request['cs']), str(request['ic']),
+                bits, int(request.get('index', 0)), version
+            )
+            return {'ok': True, 'public': public, 'private': private, 'version': version}
+        except KeyError as e:
+            self.errors += 1
+            return {'ok': False, 'error': f"missing field: {e.args[0]}"}
+        except (ValueError, TypeError, AssertionError, ArithmeticError) as e:
+            # Invalid requests, and derivations that fail in the worker (e.g. p == q for tiny keys)
+            self.errors += 1
+            return {'ok': False, 'error': str(e) or type(e).__name__}
+        except Exception as e:
+            # Any other failure (such as a broken worker pool) is answered as well, so that the
+            # connection stays open
+            self.errors += 1
+            return {'ok': False, 'error': repr(e)}
+
+    async def derive(self, password, confusion_string, iteration_count, bits, index, version=DEFAULT_VERSION):
+        '''
+        Derives a key pair on the executor, or waits for the identical derivation in flight.
+        '''
+        start_time = time.perf_counter()
+        self.requests += 1
+        key = (password, confusion_string, iteration_count, bits, index, version)
+        future = self.in_flight.get(key)
+        if future is None:
+            self.derivations += 1
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, derive, *key)
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        try:
+            # Shielded, so that a client that goes away doesn't cancel the derivation of the others
+            return await asyncio.shield(future)
+        finally:
+            self.latencies.append(time.perf_counter() - start_time)
+
+    def stats(self):
+        '''
+        Retrieves the statistics of the daemon: derivations in flight (the queue depth), request
+        counters, and percentiles of the latency of the recent requests (in seconds).
+        '''
+        stats = {
+            'queue_depth': len(self.in_flight),
+            'requests': self.requests,
+            'derivations': self.derivations,
+            'coalesced': self.coalesced,
+            'errors': self.errors
+        }
+        latencies = list(self.latencies)
+        if latencies:
+            stats['latency'] = {
+                'samples': len(latencies),
+                'mean': sum(latencies) / len(latencies),
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': max(latencies)
+            }
+        return stats
+
+
+def request(message, path=None, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+    '''
+    Client of the daemon: sends one request (a dict) to the daemon at the given Unix socket path (or
+    TCP address), and returns its response. Raises RuntimeError if the daemon answers with an error.
+    '''
+    if path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = path
+    else:
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = (host, port)
+    with connection:
+        connection.settimeout(timeout)
+        connection.connect(address)
+        connection.sendall(json.dumps(message).encode() + b'\n')
+        with connection.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("the daemon closed the connection")
+    response = json.loads(line)
+    if not response.get('ok'):
+        raise RuntimeError(response.get('error'))
+    return response
+
+
+def derive_keypair(password, confusion_string, iteration_count, bits=DEFAULT_BITS, index=0, version=DEFAULT_VERSION, **address):
+    '''
+    Client of the daemon: derives a key pair like derive.derive_keypair (key #index of the keyring),
+    and returns the PEM encoded public and private keys. The address of the daemon is given as in
+    request (path, or host and port).
+    '''
+    response = request({
+        'op': 'derive', 'pwd': password, 'cs': confusion_string, 'ic': iteration_count,
+        'bits': bits, 'index': index, 'version': version
+    }, **address)
+    return response['public'].encode(), response['private'].encode()
+
+
+if __name__ == "__main__":
+    main()
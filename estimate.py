@@ -0,0 +1,276 @@
+from prbg import PRBG, SETUP_MIN_BLOCK, SETUP_MAX_BLOCK, _fill, _jump
+from hashlib import pbkdf2_hmac
+from statistics import NormalDist
+import argparse
+import json
+import math
+import numpy as np
+import sys
+import time
+
+'''
+Quantiles (in percent) reported by default.
+'''
+QUANTILES = (50, 90, 99)
+
+'''
+Monte Carlo samples of the setup time, and largest iteration count simulated iteration by iteration:
+above it, the sum of the iteration times is approximated by a Gamma distribution with the same mean
+and variance (it is a sum of many independent, roughly exponential, times).
+'''
+SAMPLES = 10000
+MONTE_CARLO_MAX_IC = 64
+
+
+def main():
+    '''
+    This application estimates the setup time of the PRBG for a confusion string (or its size) and an
+    iteration count, on the current machine. The generator is first calibrated (the time to generate
+    and search each block size of the setup engine, and the fixed costs of each iteration and of
+    PBKDF2), or the calibration is loaded from a file. The bytes searched in each iteration follow
+    a geometric distribution whose mean is the expected waiting time of the confusion pattern (about
+    256^N bytes for N bytes, more if the pattern overlaps itself), from which the distribution of the
+    setup time is derived, and reported as quantiles. With --budget, the largest iteration count whose
+    setup time quantile (--quantile) fits in the budget is recommended instead.
+    '''
+
+    # Argument parser
+    parser = argparse.ArgumentParser(description='Deterministic RSA key generation (D-RSA): setup time estimator')
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument('--cs', type=str, help='confusion string (textual), its exact pattern is used')
+    size.add_argument('--cs-size', type=int, help='confusion string size (a random pattern is assumed)')
+    parser.add_argument('--ic', type=int, help='iteration count (number)')
+    parser.add_argument('--budget', type=float, help='setup time budget in seconds, to recommend an iteration count')
+    parser.add_argument('--quantile', type=float, default=99, help='quantile that must fit in the budget (default: 99)')
+    parser.add_argument('--samples', type=int, default=SAMPLES, help=f'Monte Carlo samples (default: {SAMPLES})')
+    parser.add_argument('--calibration', type=str, help='calibration file, loaded if it exists, or else saved to it')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the Monte Carlo simulation')
+    args = parser.parse_args()
+    if (args.ic is None) == (args.budget is None):
+        parser.error("exactly one of --ic and --budget is required")
+    if args.cs is not None and len(args.cs) >= 32:
+        parser.error("--cs must have less than 32 characters")
+    if args.cs_size is not None and not 0 < args.cs_size < 32:
+        parser.error("--cs-size must be between 1 and 31")
+
+    estimator = Estimator.load_or_calibrate(args.calibration)
+    cs = args.cs if args.cs is not None else args.cs_size
+    results = {'expected_bytes': estimator.expected_bytes(cs)}
+    if args.ic is not None:
+        results['ic'] = args.ic
+        results['mean'] = estimator.mean(cs, args.ic)
+        results['quantiles'] = estimator.quantiles(cs, args.ic, QUANTILES, args.samples, args.seed)
+    else:
+        results['budget'] = args.budget
+        results['quantile'] = args.quantile
+        results['ic'] = estimator.recommend_ic(cs, args.budget, args.quantile, args.samples, args.seed)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+def confusion_pattern(cs):
+    '''
+    Retrieves the confusion pattern of a confusion string (the setup searches for it).
+    '''
+    return bytes(int(b) for b in PRBG('', cs, 1).consufion_pattern)
+
+
+def expected_bytes(pattern):
+    '''
+    Expected number of random bytes generated until the given pattern first appears: the sum of 256^k
+    over the lengths k of the prefixes of the pattern that are also suffixes of it (including the whole
+    pattern), so self-overlapping patterns take longer to appear. An int is taken as the length of a
+    random pattern, which overlaps itself with a negligible probability.
+    '''
+    if isinstance(pattern, int):
+        return float(256 ** pattern)
+    return float(sum(256 ** k for k in range(1, len(pattern) + 1) if pattern[:k] == pattern[-k:]))
+
+
+class Estimator:
+    '''
+    Setup time model of the PRBG on a machine, described by the time to generate and search each block
+    size of the setup engine (SETUP_MIN_BLOCK doubling up to SETUP_MAX_BLOCK), the fixed time of each
+    iteration (the jump to the match and the reseed) and the time of each PBKDF2 iteration.
+    '''
+
+    def __init__(self, block_times, iteration_time, pbkdf2_time) -> None:
+        '''
+        Initializes the model with the given block times (one per block size, in seconds), fixed
+        iteration time and PBKDF2 iteration time.
+        '''
+        self.block_times = list(block_times)
+        self.iteration_time = iteration_time
+        self.pbkdf2_time = pbkdf2_time
+
+        # Stream offsets where each block of the ramp ends, and time to generate the ramp up to them
+        sizes = []
+        size = SETUP_MIN_BLOCK
+        while size < SETUP_MAX_BLOCK:
+            sizes.append(size)
+            size *= 2
+        sizes.append(SETUP_MAX_BLOCK)
+        if len(sizes) != len(self.block_times):
+            raise ValueError(f"expected {len(sizes)} block times, got {len(self.block_times)}")
+        self.block_ends = np.cumsum(np.array(sizes, dtype=np.float64))
+        self.ramp_times = np.cumsum(np.array(self.block_times, dtype=np.float64))
+
+    @classmethod
+    def calibrate(cls, repetitions=20):
+        '''
+        Measures the model parameters on the current machine, the same way the setup engine works.
+        '''
+        pattern = b'\x00\x01\x02'
+        tail = pattern[1:]
+        s = 0x0123456789ABCDEF
+        block_times = []
+        size = SETUP_MIN_BLOCK
+        while True:
+            count = max(repetitions, (repetitions * SETUP_MAX_BLOCK) // (size * 8))
+            start_time = time.perf_counter()
+            for _ in range(count):
+                block = bytearray(size)
+                s = _fill(memoryview(block), s)
+                window = tail + block
+                window.find(pattern)
+                tail = bytes(window[-len(pattern):])
+            block_times.append((time.perf_counter() - start_time) / count)
+            if size == SETUP_MAX_BLOCK:
+                break
+            size = min(2 * size, SETUP_MAX_BLOCK)
+
+        start_time = time.perf_counter()
+        for i in range(repetitions):
+            s = _jump(s, SETUP_MAX_BLOCK + i)
+            new_seed = bytearray(64)
+            s = _fill(memoryview(new_seed), s)
+        iteration_time = (time.perf_counter() - start_time) / repetitions
+
+        iterations = 10000
+        start_time = time.perf_counter()
+        pbkdf2_hmac('sha1', b'password', b'cs', iterations, 64)
+        pbkdf2_time = (time.perf_counter() - start_time) / iterations
+        return cls(block_times, iteration_time, pbkdf2_time)
+
+    @classmethod
+    def load_or_calibrate(cls, path=None):
+        '''
+        Loads the calibration from the given file if it exists, or else calibrates the model and saves
+        it to the file (if a path is given).
+        '''
+        if path is not None:
+            try:
+                with open(path, "r") as f:
+                    return cls(**json.load(f))
+            except FileNotFoundError:
+                pass
+        estimator = cls.calibrate()
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(estimator.to_dict(), f, indent=2)
+                f.write("\n")
+        return estimator
+
+    def to_dict(self):
+        '''
+        Retrieves the calibration as a dict (e.g. to be saved as JSON).
+        '''
+        return {'block_times': self.block_times, 'iteration_time': self.iteration_time, 'pbkdf2_time': self.pbkdf2_time}
+
+    def expected_bytes(self, cs):
+        '''
+        Expected bytes searched per iteration for a confusion string (or a confusion string size).
+        '''
+        return expected_bytes(cs if isinstance(cs, int) else confusion_pattern(cs))
+
+    def search_time(self, searched):
+        '''
+        Time to search the given numbers of bytes (a NumPy array) in one iteration: whole blocks are
+        generated, up to the one that contains the match.
+        '''
+        searched = np.asarray(searched, dtype=np.float64)
+        ramp = np.minimum(np.searchsorted(self.block_ends, searched), len(self.block_ends) - 1)
+        extra = np.ceil(np.maximum(searched - self.block_ends[-1], 0) / SETUP_MAX_BLOCK)
+        return self.ramp_times[ramp] + extra * self.block_times[-1]
+
+    def iteration_samples(self, cs, samples, rng):
+        '''
+        Draws samples of the time of one setup iteration: the bytes searched follow a geometric
+        distribution with the expected number of bytes as its mean.
+        '''
+        p = 1 / self.expected_bytes(cs)
+        uniform = 1 - rng.random(samples)
+        searched = np.maximum(np.ceil(np.log(uniform) / math.log1p(-p)), 1) if p < 1 else np.ones(samples)
+        return self.search_time(searched) + self.iteration_time
+
+    def mean(self, cs, ic):
+        '''
+        Mean setup time for a confusion string (or size) and an iteration count.
+        '''
+        iteration = self.iteration_samples(cs, SAMPLES * 10, np.random.default_rng(0))
+        return ic * (float(iteration.mean()) + self.pbkdf2_time)
+
+    def distribution(self, cs, ic, samples=SAMPLES, seed=0):
+        '''
+        Draws samples of the setup time for a confusion string (or size) and an iteration count, up to
+        MONTE_CARLO_MAX_IC iterations. Returns a NumPy array.
+        '''
+        rng = np.random.default_rng(seed)
+        totals = np.full(samples, ic * self.pbkdf2_time)
+        for _ in range(ic):
+            totals += self.iteration_samples(cs, samples, rng)
+        return totals
+
+    def quantiles(self, cs, ic, qs=QUANTILES, samples=SAMPLES, seed=0):
+        '''
+        Estimates the given quantiles (in percent) of the setup time for a confusion string (or size)
+        and an iteration count. Returns a dict of quantile: seconds.
+        '''
+        if ic <= MONTE_CARLO_MAX_IC:
+            totals = self.distribution(cs, ic, samples, seed)
+            return {q: float(np.percentile(totals, q)) for q in qs}
+
+        # Gamma distribution with the mean and variance of the sum of the iteration times
+        iteration = self.iteration_samples(cs, samples * 10, np.random.default_rng(seed))
+        mean = ic * float(iteration.mean())
+        variance = ic * float(iteration.var())
+        fixed = ic * self.pbkdf2_time
+        if variance == 0:
+            return {q: fixed + mean for q in qs}
+        return {q: fixed + gamma_quantile(mean * mean / variance, variance / mean, q / 100) for q in qs}
+
+    def recommend_ic(self, cs, budget, q=99, samples=SAMPLES, seed=0):
+        '''
+        Recommends the largest iteration count whose q-th percentile of the setup time is within the
+        budget (in seconds), for a confusion string (or size). Returns 0 if even one iteration is over it.
+        '''
+        def fits(ic):
+            return self.quantiles(cs, ic, (q,), samples, seed)[q] <= budget
+
+        if not fits(1):
+            return 0
+        low, high = 1, 2
+        while fits(high):
+            low, high = high, 2 * high
+        while high - low > 1:
+            middle = (low + high) // 2
+            if fits(middle):
+                low = middle
+            else:
+                high = middle
+        return low
+
+
+def gamma_quantile(shape, scale, p):
+    '''
+    Quantile p of the Gamma distribution, using the Wilson-Hilferty approximation (2X/scale follows a
+    chi-square distribution with 2*shape degrees of freedom).
+    '''
+    k = 2 * shape
+    z = NormalDist().inv_cdf(p)
+    chi_square = k * max(1 - 2 / (9 * k) + z * math.sqrt(2 / (9 * k)), 0) ** 3
+    return chi_square * scale / 2
+
+
+if __name__ == "__main__":
+    main()
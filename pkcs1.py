@@ -0,0 +1,216 @@
+import base64
+import json
+import struct
+
+'''
+DER encoding of the AlgorithmIdentifier of RSA keys in PKCS#8: the rsaEncryption OID
+(1.2.840.113549.1.1.1) with NULL parameters.
+'''
+RSA_ALGORITHM = bytes.fromhex('300d06092a864886f70d0101010500')
+
+'''
+Formats of the keystore files: JSON lines with the PEM encoded keys, or length-prefixed DER records.
+'''
+KEYSTORE_FORMATS = ('jsonl', 'der')
+
+'''
+Header of the "der" keystore files, whose records hold the version of the generator. Files without it
+were written before the version was recorded, and their records only hold the name and the keys.
+'''
+DER_KEYSTORE_MAGIC = b'DRSAKS\x00\x02'
+
+
+def der_length(length):
+    '''
+    Encodes the length of a DER element (short form below 128, long form otherwise).
+    '''
+    if length < 0x80:
+        return bytes([length])
+    size = (length.bit_length() + 7) // 8
+    return bytes([0x80 | size]) + length.to_bytes(size, byteorder='big')
+
+
+def der_integer(value):
+    '''
+    Encodes a non-negative integer (int or gmpy2.mpz) as a DER INTEGER, in the minimal number of bytes
+    (with a leading zero byte if the most significant bit is set).
+    '''
+    value = int(value)
+    if value < 0:
+        raise ValueError("only non-negative integers are supported")
+    content = value.to_bytes(value.bit_length() // 8 + 1, byteorder='big')
+    return b'\x02' + der_length(len(content)) + content
+
+
+def der_sequence(*elements):
+    '''
+    Encodes a DER SEQUENCE of already encoded elements.
+    '''
+    content = b''.join(elements)
+    return b'\x30' + der_length(len(content)) + content
+
+
+def public_key_der(n, e):
+    '''
+    Encodes a RSA public key in the PKCS#1 format (RSAPublicKey), DER encoded.
+    '''
+    return der_sequence(der_integer(n), der_integer(e))
+
+
+def private_key_der(n, e, d, p, q, dp, dq, qinv):
+    '''
+    Encodes a RSA private key in the PKCS#1 format (RSAPrivateKey, version 0), DER encoded.
+    '''
+    return der_sequence(*(der_integer(value) for value in (0, n, e, d, p, q, dp, dq, qinv)))
+
+
+def private_key_pkcs8_der(n, e, d, p, q, dp, dq, qinv):
+    '''
+    Encodes a RSA private key in the PKCS#8 format (PrivateKeyInfo wrapping the PKCS#1 key), DER encoded.
+    '''
+    key = private_key_der(n, e, d, p, q, dp, dq, qinv)
+    return der_sequence(der_integer(0), RSA_ALGORITHM, b'\x04' + der_length(len(key)) + key)
+
+
+def pem(der, marker):
+    '''
+    Encodes DER data as PEM with the given marker (e.g. "RSA PRIVATE KEY"): base64 in lines of 64
+    characters between the BEGIN and END lines, as the rsa library does.
+    '''
+    b64 = base64.standard_b64encode(der)
+    lines = [f"-----BEGIN {marker}-----".encode()]
+    lines += [b64[i:i + 64] for i in range(0, len(b64), 64)]
+    lines.append(f"-----END {marker}-----".encode())
+    lines.append(b'')
+    return b'\n'.join(lines)
+
+
+def export_der(my_rsa):
+    '''
+    Exports the public and private keys of the given DRSA instance in the PKCS#1 format, DER encoded.
+    '''
+    n, e, d, p, q = my_rsa.get_private_params()
+    dp, dq, qinv = my_rsa.get_crt_params()
+    return public_key_der(n, e), private_key_der(n, e, d, p, q, dp, dq, qinv)
+
+
+def export_pem(my_rsa):
+    '''
+    Exports the public and private keys of the given DRSA instance in the PKCS#1 format, PEM encoded
+    (byte-identical to the save_pkcs1() output of the rsa library).
+    '''
+    publicKeyDer, privateKeyDer = export_der(my_rsa)
+    return pem(publicKeyDer, "RSA PUBLIC KEY"), pem(privateKeyDer, "RSA PRIVATE KEY")
+
+
+def export_pkcs8_pem(my_rsa):
+    '''
+    Exports the private key of the given DRSA instance in the PKCS#8 format, PEM encoded.
+    '''
+    n, e, d, p, q = my_rsa.get_private_params()
+    dp, dq, qinv = my_rsa.get_crt_params()
+    return pem(private_key_pkcs8_der(n, e, d, p, q, dp, dq, qinv), "PRIVATE KEY")
+
+
+class KeystoreWriter:
+    '''
+    Appends many key pairs to a single keystore file, opened once and written through a buffer. Each
+    record holds a name and a key pair (PKCS#1), and its index is its position in the file. In the
+    "jsonl" format, each record is a JSON object on one line with the name and the PEM encoded public
+    and private keys (and the version of the generator they were derived with, if given, so that they
+    can be derived again); in the "der" format, the file starts with DER_KEYSTORE_MAGIC, and each record
+    is the name (UTF-8), the DER encoded public and private keys and the version (ASCII, empty if not
+    given), each one preceded by its length (4 bytes, big endian).
+    '''
+
+    def __init__(self, path, format='jsonl') -> None:
+        '''
+        Opens the keystore file for appending.
+        '''
+        if format not in KEYSTORE_FORMATS:
+            raise ValueError(f"unknown keystore format {format!r}, expected one of {KEYSTORE_FORMATS}")
+        self.format = format
+        self.file = open(path, "ab")
+        if format == 'der':
+            if self.file.tell() == 0:
+                self.file.write(DER_KEYSTORE_MAGIC)
+            else:
+                with open(path, "rb") as f:
+                    header = f.read(len(DER_KEYSTORE_MAGIC))
+                if header != DER_KEYSTORE_MAGIC:
+                    self.file.close()
+                    raise ValueError(f"{path} is a keystore without versions, start a new keystore to append to")
+
+    def add(self, name, my_rsa, version=None):
+        '''
+        Appends the key pair of the given DRSA instance to the keystore.
+        '''
+        self.add_der(name, *export_der(my_rsa), version)
+
+    def add_der(self, name, publicKeyDer, privateKeyDer, version=None):
+        '''
+        Appends a key pair, given its DER encoded public and private keys, to the keystore.
+        '''
+        if self.format == 'jsonl':
+            record = {
+                'name': name,
+                'public': pem(publicKeyDer, "RSA PUBLIC KEY").decode(),
+                'private': pem(privateKeyDer, "RSA PRIVATE KEY").decode()
+            }
+            if version is not None:
+                record['version'] = version
+            self.file.write(json.dumps(record).encode() + b'\n')
+        else:
+            for field in (name.encode(), publicKeyDer, privateKeyDer, (version or '').encode()):
+                self.file.write(struct.pack('>I', len(field)))
+                self.file.write(field)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_keystore(path, format='jsonl', versions=False):
+    '''
+    Iterates over the records of a keystore file, yielding (name, public key, private key) with the
+    keys PEM encoded ("jsonl") or DER encoded ("der"). With versions, the version of the generator is
+    yielded as well, as a fourth item (None if the record doesn't hold it).
+    '''
+    if format not in KEYSTORE_FORMATS:
+        raise ValueError(f"unknown keystore format {format!r}, expected one of {KEYSTORE_FORMATS}")
+    with open(path, "rb") as f:
+        if format == 'jsonl':
+            for line in f:
+                record = json.loads(line)
+                keys = record['name'], record['public'].encode(), record['private'].encode()
+                yield keys + (record.get('version'),) if versions else keys
+            return
+        versioned = f.read(len(DER_KEYSTORE_MAGIC)) == DER_KEYSTORE_MAGIC
+        if not versioned:
+            f.seek(0)
+        while True:
+            fields = []
+            for _ in range(4 if versioned else 3):
+                header = f.read(4)
+                if not header and not fields:
+                    return
+                if len(header) < 4:
+                    raise ValueError(f"truncated keystore record in {path}")
+                size, = struct.unpack('>I', header)
+                field = f.read(size)
+                if len(field) < size:
+                    raise ValueError(f"truncated keystore record in {path}")
+                fields.append(field)
+            keys = fields[0].decode(), fields[1], fields[2]
+            if versions:
+                yield keys + ((fields[3].decode() or None) if versioned else None,)
+            else:
+                yield keys
@@ -1,5 +1,458 @@
 from hashlib import pbkdf2_hmac, sha256
-import numpy as np
+from collections import OrderedDict
+import hmac
+import io
+import json
+import os
+import struct
+import threading
+import time
+
+'''
+NumPy is optional, and only imported when it is first needed (by the numpy backend, or to fill a large
+buffer), so that short runs don't pay for the import. See _numpy.
+'''
+np = None
+_numpy_checked = False
+
+'''
+Masks used to emulate the signed 64-bit (np.int64) arithmetic of the generator with Python ints.
+'''
+MASK64 = 0xFFFFFFFFFFFFFFFF
+SIGN64 = 0x8000000000000000
+
+'''
+Available arithmetic backends: "int" computes the XorShift with Python ints masked to 64 bits, and
+"numpy" with np.int64 scalars (the original implementation). Both produce identical streams.
+'''
+BACKENDS = ('int', 'numpy')
+
+'''
+Bounds of the block size (in bytes) used by the setup engine when searching for the confusion pattern.
+Blocks start small, so that short patterns don't waste generated bytes, and double up to the maximum.
+'''
+SETUP_MIN_BLOCK = 64
+SETUP_MAX_BLOCK = 1 << 16
+
+'''
+Bulk generation with NumPy: outputs of at least VECTOR_MIN_BYTES are produced by advancing about
+VECTOR_LANES independent copies of the generator (each one jumped to the start of its own segment)
+in lockstep, VECTOR_CHUNK bytes at a time.
+'''
+VECTOR_MIN_BYTES = 1 << 15
+VECTOR_LANES = 1 << 13
+VECTOR_CHUNK = 1 << 21
+
+'''
+Number of output words (of 8 bytes) computed and packed at once by the generators of 8 bytes per step.
+'''
+WORDS_BLOCK = 1 << 12
+
+'''
+MultiPRBG advances its lanes in lockstep while at least MULTI_MIN_LANES of them are still being set
+up: below that, the per-step overhead of the arrays outweighs their width, and the remaining lanes
+are finished by the (blocked) setup of each PRBG.
+'''
+MULTI_MIN_LANES = 64
+
+'''
+Cache of the GF(2) matrices of T^(2^i), where T is the XorShift step. Each matrix is stored as the
+list of its 64 columns (the image of each single-bit state), and is built on demand by squaring.
+The caches of jump matrices (this one and Xoshiro256.matrices) are only extended while holding
+_matrices_lock, since a level appended twice by concurrent threads would shift all the next ones.
+'''
+_jump_matrices = []
+_jump_tables = {}
+_matrices_lock = threading.Lock()
+
+
+def _numpy():
+    '''
+    Imports NumPy on first use, returning the module, or None if it is not installed.
+    '''
+    global np, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        _numpy_checked = True
+    return np
+
+
+def _step(s):
+    '''
+    Computes a single XorShift step over an unsigned 64-bit representation of the state.
+    '''
+    s ^= (s << 13) & MASK64
+    s ^= (s >> 17) | (0xFFFF800000000000 if s & SIGN64 else 0)
+    s ^= (s << 5) & MASK64
+    return s
+
+
+def _fill(view, s):
+    '''
+    Fills the given byte memoryview with the low bytes of the successive states after s (unsigned 64-bit
+    representation), and returns the last state. The XorShift step is inlined for speed, and large
+    buffers are filled with NumPy when it is available.
+    '''
+    if len(view) >= VECTOR_MIN_BYTES and _numpy() is not None:
+        s, position = _fill_vector(view, s)
+        view = view[position:]
+    for i in range(len(view)):
+        s ^= (s << 13) & MASK64
+        if s & SIGN64:
+            s ^= (s >> 17) | 0xFFFF800000000000
+        else:
+            s ^= s >> 17
+        s ^= (s << 5) & MASK64
+        view[i] = s & 0xFF
+    return s
+
+
+def _fill_vector(view, s, width=1):
+    '''
+    Fills the given byte memoryview like _fill, advancing many generators at once with NumPy arrays,
+    with the low byte (width 1) or all the 8 bytes, low byte first (width 8), of each state. Each chunk
+    is split in segments of 2^k states; the state at the start of each segment is computed by
+    repeatedly doubling the number of known segment starts with jumps of T^(2^(k+j)), and all segments
+    are then generated in lockstep (using int64 views for the arithmetic right shift). Returns the last
+    state and the number of bytes filled: the rest of the view (less than VECTOR_MIN_BYTES states) is
+    left to the caller.
+    '''
+    position = 0
+    while (len(view) - position) // width >= VECTOR_MIN_BYTES:
+        size = min((len(view) - position) // width, VECTOR_CHUNK)
+        k = (size // VECTOR_LANES).bit_length() - 1
+        steps = 1 << k
+        lanes = size // steps
+
+        states = np.empty(lanes, dtype=np.uint64)
+        states[0] = s
+        known = 1
+        j = 0
+        while known < lanes:
+            count = min(known, lanes - known)
+            states[known:known + count] = _apply_tables(_jump_table(k + j), states[:count])
+            known += count
+            j += 1
+
+        out = np.empty((steps, lanes), dtype=np.uint8 if width == 1 else np.uint64)
+        tmp = np.empty_like(states)
+        signed_states = states.view(np.int64)
+        signed_tmp = tmp.view(np.int64)
+        for step in range(steps):
+            np.left_shift(states, np.uint64(13), out=tmp)
+            states ^= tmp
+            np.right_shift(signed_states, np.int64(17), out=signed_tmp)
+            states ^= tmp
+            np.left_shift(states, np.uint64(5), out=tmp)
+            states ^= tmp
+            out[step] = states
+
+        dtype = np.uint8 if width == 1 else '<u8'
+        np.frombuffer(view[position:position + lanes * steps * width], dtype=dtype).reshape(lanes, steps)[...] = out.T
+        s = int(states[-1])
+        position += lanes * steps * width
+    return s, position
+
+
+def _apply(columns, s):
+    '''
+    Multiplies a GF(2) matrix, given by its columns, by the state s.
+    '''
+    result = 0
+    i = 0
+    while s:
+        if s & 1:
+            result ^= columns[i]
+        s >>= 1
+        i += 1
+    return result
+
+
+def _jump_matrix(i):
+    '''
+    Retrieves the matrix of T^(2^i), squaring the previous ones if they are not yet computed.
+    '''
+    if len(_jump_matrices) <= i:
+        with _matrices_lock:
+            while len(_jump_matrices) <= i:
+                if not _jump_matrices:
+                    _jump_matrices.append([_step(1 << j) for j in range(64)])
+                else:
+                    previous = _jump_matrices[-1]
+                    _jump_matrices.append([_apply(previous, column) for column in previous])
+    return _jump_matrices[i]
+
+
+def _jump_table(i):
+    '''
+    Retrieves the matrix of T^(2^i) as 8 NumPy lookup tables of 256 entries, one per byte of the
+    state, so that it can be applied to whole arrays of states with 8 lookups.
+    '''
+    if i not in _jump_tables:
+        columns = _jump_matrix(i)
+        tables = np.zeros((8, 256), dtype=np.uint64)
+        for byte in range(8):
+            for value in range(1, 256):
+                low = value & -value
+                tables[byte, value] = tables[byte, value ^ low] ^ np.uint64(columns[8 * byte + low.bit_length() - 1])
+        _jump_tables[i] = tables
+    return _jump_tables[i]
+
+
+def _apply_tables(tables, states):
+    '''
+    Multiplies a GF(2) matrix, given by its byte lookup tables, by each state of a NumPy uint64 array.
+    '''
+    result = tables[0][states & np.uint64(0xFF)]
+    for byte in range(1, 8):
+        result ^= tables[byte][(states >> np.uint64(8 * byte)) & np.uint64(0xFF)]
+    return result
+
+
+def _jump(s, k):
+    '''
+    Advances the state s (unsigned 64-bit representation) by k XorShift steps in O(log k) matrix
+    applications. The step only uses shifts and xors, so it is linear over GF(2), and the arithmetic
+    right shift is linear as well (it copies the sign bit).
+    '''
+    i = 0
+    while k:
+        if k & 1:
+            s = _apply(_jump_matrix(i), s)
+        k >>= 1
+        i += 1
+    return s
+
+
+def _to_signed(s):
+    '''
+    Converts an unsigned 64-bit representation of the state to its signed (np.int64) value.
+    '''
+    return s - (1 << 64) if s & SIGN64 else s
+
+
+class LowByteXorShift:
+    '''
+    Generator "v1" (the original one, and the default): a 64-bit XorShift seeded with 32 bits, which
+    outputs the low byte of each state. Its state is the unsigned 64-bit representation of the XorShift
+    state. The generators of the other versions implement the same interface: seed(), fill(), jump(),
+    phase(), dump() and load(), over their own states.
+
+    A generator that outputs several bytes per step has an alignment: in setup(), the confusion pattern
+    only counts when it ends at the end of a step (see phase), so that an iteration takes as many steps,
+    on average, as with v1. Otherwise, the setup would take 8 times less work for the same confusion
+    string and iteration count.
+    '''
+
+    version = 'v1'
+    align = 1
+
+    def seed(self, data):
+        '''
+        Computes the state seeded by the given bytes (the PBKDF2 output, or the 64 bytes of a reseed),
+        of which only the last 4 survive the 32-bit mask.
+        '''
+        return int.from_bytes(data, byteorder='big') & 0xFFFFFFFF
+
+    def fill(self, view, s):
+        '''
+        Fills the given byte memoryview with the next bytes after the state s, and returns the new state.
+        '''
+        return _fill(view, s)
+
+    def jump(self, s, k):
+        '''
+        Advances the state s by k bytes, in O(log k).
+        '''
+        return _jump(s, k)
+
+    def phase(self, s):
+        '''
+        Retrieves the number of bytes of the output of the current step already produced, modulo the
+        alignment (always 0 for v1, which outputs a single byte per step).
+        '''
+        return 0
+
+    def dump(self, s):
+        '''
+        Converts a state to a JSON value (for the setup checkpoints).
+        '''
+        return _to_signed(s)
+
+    def load(self, value):
+        '''
+        Converts a JSON value written by dump() back to a state.
+        '''
+        return value & MASK64
+
+
+class WordXorShift(LowByteXorShift):
+    '''
+    Generator "v2": the XorShift of v1, seeded with 64 bits, which outputs all the 8 bytes of each state
+    (low byte first), so it produces 8 bytes per step instead of one. Its state is the XorShift state
+    and the number of bytes of it already output.
+    '''
+
+    version = 'v2'
+    align = 8
+
+    def seed(self, data):
+        '''
+        Computes the state seeded by the last 8 of the given bytes. A zero state, which XorShift never
+        leaves, is replaced by 1.
+        '''
+        return (int.from_bytes(data, byteorder='big') & MASK64 or 1, 8)
+
+    def fill(self, view, state):
+        s, used = state
+        position = min(8 - used, len(view))
+        view[:position] = s.to_bytes(8, byteorder='little')[used:used + position]
+        used += position
+        if (len(view) - position) // 8 >= VECTOR_MIN_BYTES and _numpy() is not None:
+            s, size = _fill_vector(view[position:], s, 8)
+            position += size
+        while len(view) - position >= 8:
+            count = min((len(view) - position) // 8, WORDS_BLOCK)
+            words = [0] * count
+            for i in range(count):
+                s ^= (s << 13) & MASK64
+                if s & SIGN64:
+                    s ^= (s >> 17) | 0xFFFF800000000000
+                else:
+                    s ^= s >> 17
+                s ^= (s << 5) & MASK64
+                words[i] = s
+            view[position:position + 8 * count] = struct.pack(f'<{count}Q', *words)
+            position += 8 * count
+        if position < len(view):
+            s = _step(s)
+            used = len(view) - position
+            view[position:] = s.to_bytes(8, byteorder='little')[:used]
+        return (s, used)
+
+    def jump(self, state, k):
+        s, used = state
+        if k <= 8 - used:
+            return (s, used + k)
+        k -= 8 - used
+        steps = (k + 7) // 8
+        return (_jump(s, steps), k - 8 * (steps - 1))
+
+    def phase(self, state):
+        return state[-1] % 8
+
+    def dump(self, state):
+        return list(state)
+
+    def load(self, value):
+        return tuple(value)
+
+
+class Xoshiro256(WordXorShift):
+    '''
+    Generator "v3": xoshiro256** (Blackman and Vigna), with a 256-bit state seeded by 32 bytes, which
+    outputs the 8 bytes of each 64-bit result (low byte first). Its transition is linear over GF(2), so
+    it jumps with matrices like v1 (of 256 columns). Its state is the 4 state words, the last output
+    word and the number of bytes of it already output.
+    '''
+
+    version = 'v3'
+
+    def __init__(self) -> None:
+        self.matrices = []
+
+    def seed(self, data):
+        '''
+        Computes the state seeded by the last 32 of the given bytes (as 4 big endian words). A zero
+        state, which is never left, is replaced by 1.
+        '''
+        value = int.from_bytes(data, byteorder='big') & ((1 << 256) - 1) or 1
+        return tuple((value >> (64 * (3 - i))) & MASK64 for i in range(4)) + (0, 8)
+
+    def fill(self, view, state):
+        s0, s1, s2, s3, word, used = state
+        position = min(8 - used, len(view))
+        view[:position] = word.to_bytes(8, byteorder='little')[used:used + position]
+        used += position
+        while position < len(view):
+            count = min(-(-(len(view) - position) // 8), WORDS_BLOCK)
+            words = [0] * count
+            for i in range(count):
+                word = (s1 * 5) & MASK64
+                words[i] = (((word << 7) | (word >> 57)) * 9) & MASK64
+                t = (s1 << 17) & MASK64
+                s2 ^= s0
+                s3 ^= s1
+                s1 ^= s2
+                s0 ^= s3
+                s2 ^= t
+                s3 = ((s3 << 45) | (s3 >> 19)) & MASK64
+            word = words[-1]
+            size = min(8 * count, len(view) - position)
+            view[position:position + size] = struct.pack(f'<{count}Q', *words)[:size]
+            position += size
+            used = size - 8 * (count - 1)
+        return (s0, s1, s2, s3, word, used)
+
+    def jump(self, state, k):
+        s0, s1, s2, s3, word, used = state
+        if k <= 8 - used:
+            return (s0, s1, s2, s3, word, used + k)
+        k -= 8 - used
+        steps = (k + 7) // 8
+
+        # Jump over all the steps but the last one, whose output word is needed
+        packed = s0 | (s1 << 64) | (s2 << 128) | (s3 << 192)
+        n = steps - 1
+        i = 0
+        while n:
+            if n & 1:
+                packed = _apply(self._matrix(i), packed)
+            n >>= 1
+            i += 1
+        state = tuple((packed >> (64 * j)) & MASK64 for j in range(4)) + (0, 8)
+        return self.fill(memoryview(bytearray(k - 8 * (steps - 1))), state)
+
+    def _matrix(self, i):
+        '''
+        Retrieves the matrix of the transition applied 2^i times (over the 4 state words packed in a
+        256-bit int), squaring the previous ones if they are not yet computed.
+        '''
+        if len(self.matrices) <= i:
+            with _matrices_lock:
+                while len(self.matrices) <= i:
+                    if not self.matrices:
+                        self.matrices.append([self._transition(1 << j) for j in range(256)])
+                    else:
+                        previous = self.matrices[-1]
+                        self.matrices.append([_apply(previous, column) for column in previous])
+        return self.matrices[i]
+
+    def _transition(self, packed):
+        '''
+        Computes the state transition of xoshiro256 over the 4 state words packed in a 256-bit int.
+        '''
+        s0, s1, s2, s3 = ((packed >> (64 * j)) & MASK64 for j in range(4))
+        t = (s1 << 17) & MASK64
+        s2 ^= s0
+        s3 ^= s1
+        s1 ^= s2
+        s0 ^= s3
+        s2 ^= t
+        s3 = ((s3 << 45) | (s3 >> 19)) & MASK64
+        return s0 | (s1 << 64) | (s2 << 128) | (s3 << 192)
+
+
+'''
+Generators by version tag. "v1" is the default, and keeps the streams (and so the keys) of the original
+implementation; "v2" and "v3" are opt-in, and produce 8 bytes per step.
+'''
+GENERATORS = {generator.version: generator for generator in (LowByteXorShift(), WordXorShift(), Xoshiro256())}
+VERSIONS = tuple(GENERATORS)
+DEFAULT_VERSION = 'v1'
 
 
 class PRBG:
@@ -9,41 +462,226 @@ class PRBG:
     counter.
     '''
 
-    def __init__(self, password, confusion_string, iteration_count) -> None:
+    def __init__(self, password, confusion_string, iteration_count, backend='int', version=DEFAULT_VERSION) -> None:
         '''
         Initializes a PRBG object with a seed, which is generated using the PBKDF2 method with the
         password, the confusion string, and the iteration counter. The confusion pattern attribute is
-        also generated.
+        also generated. The backend selects how the state is represented: Python ints ("int") or
+        np.int64 scalars ("numpy"), see BACKENDS. The version selects the generator (see GENERATORS):
+        the streams of different versions are unrelated, and only "v1" supports the numpy backend.
         '''
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend {backend!r}, expected one of {BACKENDS}")
+        if version not in GENERATORS:
+            raise ValueError(f"unknown generator version {version!r}, expected one of {VERSIONS}")
+        if backend == 'numpy' and version != 'v1':
+            raise ValueError(f"the numpy backend only supports the v1 generator, not {version}")
+        if backend == 'numpy' and _numpy() is None:
+            raise ImportError("the numpy backend requires NumPy to be installed")
+        self.backend = backend
+        self.version = version
         bytes_seed = self._compute_seed(password, confusion_string, iteration_count)
-        self.seed = self._bytes_to_int(bytes_seed)
-        self.seed = np.int64(self._bytes_to_int(bytes_seed) & 0xFFFFFFFF)
+        self._set_state(self.generator.seed(bytes_seed))
         self.iteration_count = int(iteration_count)
         self.consufion_pattern = self._get_confusion_pattern(confusion_string)
         self.buffer = Buffer(len(self.consufion_pattern))
         self.setted_up = False
+        self.bytes_searched = 0
+
+
+    def __setstate__(self, state):
+        '''
+        Restores a pickled PRBG (e.g. in a worker process), importing NumPy if its backend needs it.
+        '''
+        self.__dict__.update(state)
+        if self.backend == 'numpy':
+            _numpy()
+
+
+    @property
+    def generator(self):
+        '''
+        The generator of the version of this PRBG.
+        '''
+        return GENERATORS[self.version]
+
+
+    def _state(self):
+        '''
+        Retrieves the current state in the representation of the generator (for v1, the unsigned 64-bit
+        representation of the seed).
+        '''
+        return int(self.seed) & MASK64 if self.version == 'v1' else self.seed
+
+
+    def _set_state(self, s):
+        '''
+        Sets the current state, given in the representation of the generator.
+        '''
+        self.seed = self._wrap(_to_signed(s)) if self.version == 'v1' else s
 
 
     def _reseed(self, seed):
         '''
         Used to reseed the PRBG with a set of bytes.
         '''
-        self.seed = np.int64(self._bytes_to_int(seed) & 0xFFFFFFFF)
+        self._set_state(self.generator.seed(seed))
 
 
-    def setup(self):
+    def _wrap(self, value):
+        '''
+        Converts a signed 64-bit value (Python int) to the state representation of the backend.
+        '''
+        return np.int64(value) if self.backend == 'numpy' else value
+
+
+    def setup(self, checkpoint=None, checkpoint_interval=60, stats=None, progress=None, keep_checkpoint=False):
         '''
         Sets up the generator to a state that can take an arbitrarily high computation time to reach.
         The current state is changed by generating the next byte until the confusion pattern is found
         amongst the last N bytes generated, for the given number of iterations. In the end of each iteration,
         the generator is reseeded.
+
+        The bytes are generated in blocks, and each block (preceded by the last N-1 bytes seen) is scanned
+        for the confusion pattern with a native substring search. When a match is found, the state right
+        after the matching byte is recovered with a jump from the start of the block, so the match position,
+        the reseed and the final state are exactly the ones of the byte-by-byte algorithm (_setup_legacy).
+
+        If a checkpoint file path is given, the progress (completed iterations, current state and last
+        N bytes) is saved to it every checkpoint_interval seconds, and an existing checkpoint of the same
+        setup is resumed instead of starting over. Since it holds the generator state, the checkpoint is
+        removed when the setup finishes, unless keep_checkpoint is true: then the final state is saved to
+        it, so that later setups with the same parameters are skipped.
+
+        The number of bytes generated while searching for the pattern is kept in bytes_searched. If a
+        SetupStats object is given, the bytes searched and the time of each iteration are recorded in it,
+        and if a progress callable is given, it is called after each iteration with the number of
+        completed iterations, the iteration count and the bytes searched so far.
+        '''
+        pattern = bytes(int(b) for b in self.consufion_pattern)
+        if not pattern:
+            raise ValueError("the confusion pattern must not be empty")
+        generator = self.generator
+        keep = len(pattern) - 1
+        recent = bytes(int(b) for b in self.buffer.buffer)
+        s = self._state()
+        start = 0
+        searched = 0
+
+        if stats is not None:
+            setup_start = time.perf_counter()
+
+        if checkpoint is not None:
+            fingerprint = self._fingerprint(pattern)
+            if os.path.exists(checkpoint):
+                start, s, recent = self._load_checkpoint(checkpoint, fingerprint)
+                self.setted_up = self.setted_up or start > 0
+            last_save = time.monotonic()
+        if stats is not None:
+            stats.resumed_from = start
+
+        for iteration in range(start, self.iteration_count):
+            if stats is not None:
+                iteration_start = time.perf_counter()
+                iteration_searched = searched
+            block_size = SETUP_MIN_BLOCK
+            while True:
+                tail = recent[-keep:] if keep else b''
+                block = bytearray(block_size)
+                end = generator.fill(memoryview(block), s)
+                window = tail + block
+                index = window.find(pattern)
+                if generator.align > 1:
+                    phase = generator.phase(s)
+                    while index >= 0 and (phase + index + len(pattern) - len(tail)) % generator.align:
+                        index = window.find(pattern, index + 1)
+                if index >= 0:
+                    s = generator.jump(s, index + len(pattern) - len(tail))
+                    searched += index + len(pattern) - len(tail)
+                    break
+                s = end
+                searched += block_size
+                recent = bytes(window[-len(pattern):])
+                block_size = min(2 * block_size, SETUP_MAX_BLOCK)
+                if checkpoint is not None and time.monotonic() - last_save >= checkpoint_interval:
+                    self._save_checkpoint(checkpoint, fingerprint, iteration, s, recent)
+                    last_save = time.monotonic()
+
+            # Reseed with the next 64 bytes (for v1, only the last 4 survive the 32-bit mask)
+            new_seed = bytearray(64)
+            s = generator.fill(memoryview(new_seed), s)
+            s = generator.seed(new_seed)
+            recent = pattern
+            self.setted_up = True
+            if stats is not None:
+                stats.add_iteration(searched - iteration_searched, time.perf_counter() - iteration_start)
+            if progress is not None:
+                progress(iteration + 1, self.iteration_count, searched)
+
+        self._set_state(s)
+        self.buffer.buffer = [self._wrap(b) for b in recent]
+        self.bytes_searched = searched
+        if checkpoint is not None:
+            if keep_checkpoint:
+                self._save_checkpoint(checkpoint, fingerprint, self.iteration_count, s, recent)
+            elif os.path.exists(checkpoint):
+                os.remove(checkpoint)
+        if stats is not None:
+            stats.time = time.perf_counter() - setup_start
+
+
+    def _fingerprint(self, pattern):
+        '''
+        Identifies a setup run by its starting state, confusion pattern and iteration count, so that a
+        checkpoint is never resumed by a different setup (or generator version). The password itself
+        is not stored.
+        '''
+        if self.version == 'v1':
+            return sha256(f"{int(self.seed)}:{pattern.hex()}:{self.iteration_count}".encode()).hexdigest()
+        return sha256(f"{self.version}:{list(self.seed)}:{pattern.hex()}:{self.iteration_count}".encode()).hexdigest()
+
+
+    def _save_checkpoint(self, path, fingerprint, iteration, s, recent):
+        '''
+        Atomically writes a setup checkpoint (readable by the owner only, since it holds the state).
+        '''
+        checkpoint = {
+            'fingerprint': fingerprint,
+            'iteration': iteration,
+            'seed': self.generator.dump(s),
+            'buffer': list(recent)
+        }
+        tmp_path = f"{path}.tmp"
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+    def _load_checkpoint(self, path, fingerprint):
+        '''
+        Reads a setup checkpoint, returning the completed iterations, the state and the last bytes seen.
         '''
+        with open(path, "r") as f:
+            checkpoint = json.load(f)
+        if checkpoint['fingerprint'] != fingerprint:
+            raise ValueError(f"checkpoint {path} belongs to a different setup")
+        return checkpoint['iteration'], self.generator.load(checkpoint['seed']), bytes(checkpoint['buffer'])
+
+
+    def _setup_legacy(self):
+        '''
+        Byte-by-byte reference implementation of setup(), kept to check the parity of the faster engine.
+        '''
+        generator = self.generator
         counter = 0
         for _ in range(self.iteration_count):
             while True:
                 self.buffer.add(self.next_byte())
                 counter += 1
-                if self.consufion_pattern == self.buffer.buffer:
+                aligned = generator.align == 1 or generator.phase(self._state()) == 0
+                if aligned and self.consufion_pattern == self.buffer.buffer:
                     new_seed = []
                     for _ in range(64):
                         new_seed.append(self.next_byte())
@@ -58,12 +696,63 @@ class PRBG:
         Generates the next byte of the generator, according to the current seed, using
         a XorShift approach.
         '''
-        s = self.seed
-        s ^= s << np.int64(13)
-        s ^= s >> np.int64(17)
-        s ^= s << np.int64(5)
-        self.seed = s
-        return np.int64(s & np.int64(0xFF))
+        if self.backend == 'numpy':
+            s = self.seed
+            s ^= s << np.int64(13)
+            s ^= s >> np.int64(17)
+            s ^= s << np.int64(5)
+            self.seed = s
+            return np.int64(s & np.int64(0xFF))
+        if self.version != 'v1':
+            byte = bytearray(1)
+            self.fill(byte)
+            return byte[0]
+        s = _step(self.seed & MASK64)
+        self.seed = _to_signed(s)
+        return s & 0xFF
+
+
+    def next_bytes(self, n):
+        '''
+        Generates the next n bytes of the generator at once. The result is identical to calling
+        next_byte() n times, and the generator is left in the same state.
+        '''
+        buffer = bytearray(int(n))
+        self.fill(buffer)
+        return bytes(buffer)
+
+
+    def fill(self, buffer):
+        '''
+        Fills the given writable buffer (bytearray, memoryview, ...) with the next bytes of the
+        generator, and returns the number of bytes written. The XorShift step is computed with Python
+        ints masked to 64 bits (with an arithmetic right shift) whatever the backend, which reproduces
+        the np.int64 wraparound exactly without creating NumPy scalars for each byte.
+        '''
+        view = memoryview(buffer).cast('B')
+        self._set_state(self.generator.fill(view, self._state()))
+        return len(view)
+
+
+    def _restore(self, s):
+        '''
+        Puts the generator in the state left by setup(), given the post-setup state (see _state): after
+        setup, the buffer always holds the confusion pattern. Used by SetupCache.
+        '''
+        self._set_state(s)
+        self.buffer.buffer = list(self.consufion_pattern)
+        self.setted_up = True
+        self.bytes_searched = 0
+
+
+    def jump(self, k):
+        '''
+        Advances the generator by k bytes without generating them, leaving it in the same state as
+        k calls to next_byte() would. Takes O(log k) time.
+        '''
+        if k < 0:
+            raise ValueError("cannot jump backwards")
+        self._set_state(self.generator.jump(self._state(), int(k)))
 
 
     def _compute_seed(self, password, confusion_string, iteration_count):
@@ -88,7 +777,7 @@ class PRBG:
         hashvalue = sha256(confusion_string.encode()).digest()
         index = sum(hashvalue) % (len(hashvalue) - len(confusion_string))
         cp = hashvalue[index:index+len(confusion_string)]
-        return [np.int64(c) for c in cp]
+        return [self._wrap(c) for c in cp]
 
     def _bytes_to_int(self,bytes):
         '''
@@ -102,8 +791,189 @@ class PRBG:
         return result
 
     def __str__(self) -> str:
-        return f"  PRGB geneartor:\n    current state: {self.seed}\n    cp: {self.consufion_pattern} (len={len(self.consufion_pattern)})\n    ic: {self.iteration_count}\n    setted up: {'yes' if self.setted_up else 'no'}"
+        return f"  PRGB geneartor:\n    current state: {self.seed} ({self.version}, {self.backend})\n    cp: {[int(c) for c in self.consufion_pattern]} (len={len(self.consufion_pattern)})\n    ic: {self.iteration_count}\n    setted up: {'yes' if self.setted_up else 'no'}"
+
+
+
+class PRBGStream(io.RawIOBase):
+    '''
+    Read-only, seekable file-like view of the byte stream of a PRBG, starting at its state when the
+    stream is created (usually right after setup). Offset 0 is the byte that the next call to
+    next_byte() would return. Seeking is done with jumps, so reading at any offset costs O(log offset)
+    plus the number of bytes read. The PRBG itself is not advanced by the stream.
+    '''
+
+    def __init__(self, prbg) -> None:
+        super().__init__()
+        self.generator = prbg.generator
+        self.origin = prbg._state()
+        self.state = self.origin
+        self.state_position = 0
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        '''
+        Moves to the given offset of the stream. The stream is infinite, so SEEK_END is not supported.
+        '''
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("the PRBG stream has no end")
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self.position = int(offset)
+        return self.position
+
+    def readinto(self, buffer):
+        '''
+        Reads len(buffer) bytes from the current offset into the given writable buffer.
+        '''
+        if self.position >= self.state_position:
+            self.state = self.generator.jump(self.state, self.position - self.state_position)
+        else:
+            self.state = self.generator.jump(self.origin, self.position)
+        view = memoryview(buffer).cast('B')
+        self.state = self.generator.fill(view, self.state)
+        self.position += len(view)
+        self.state_position = self.position
+        return len(view)
+
+    def readall(self):
+        raise io.UnsupportedOperation("the PRBG stream is infinite, a size must be given")
+
+
+
+class MultiPRBG:
+    '''
+    Sets up many PRBG instances (lanes) at once, for bulk provisioning with short confusion strings.
+    The states of all the lanes are kept in a NumPy array and advanced in lockstep, each lane with its
+    own rolling window of the last bytes (as an integer), confusion pattern and iteration count. When
+    a lane finds its pattern, its reseed (the last 4 of the next 64 bytes) is computed at once with a
+    jump, and the lane is retired when it completes its iterations (the last MULTI_MIN_LANES lanes
+    are finished on their own). Each PRBG ends in the same state as with its own setup().
+    '''
+
+    def __init__(self, prbgs) -> None:
+        '''
+        Initializes the engine with the PRBG instances to set up.
+        '''
+        if _numpy() is None:
+            raise ImportError("MultiPRBG requires NumPy to be installed")
+        self.prbgs = list(prbgs)
+
+    def setup(self):
+        '''
+        Sets up all the PRBG instances, as PRBG.setup() would (the bytes searched are kept in their
+        bytes_searched). Patterns longer than 8 bytes don't fit in a window integer, and their lanes
+        are set up on their own, as are the generators of versions other than v1.
+        '''
+        lanes = []
+        for prbg in self.prbgs:
+            if not prbg.consufion_pattern:
+                raise ValueError("the confusion pattern must not be empty")
+            if len(prbg.consufion_pattern) > 8 or prbg.version != 'v1':
+                prbg.setup()
+            elif prbg.iteration_count > 0:
+                lanes.append(prbg)
+        if not lanes:
+            return
+
+        patterns = [bytes(int(b) for b in prbg.consufion_pattern) for prbg in lanes]
+        recent = [bytes(int(b) for b in prbg.buffer.buffer)[-len(pattern):] for prbg, pattern in zip(lanes, patterns)]
+        ids = np.arange(len(lanes))
+        states = np.array([int(prbg.seed) & MASK64 for prbg in lanes], dtype=np.uint64)
+        windows = np.array([int.from_bytes(tail, byteorder='big') for tail in recent], dtype=np.uint64)
+        pattern_values = np.array([int.from_bytes(pattern, byteorder='big') for pattern in patterns], dtype=np.uint64)
+        masks = np.array([(1 << (8 * len(pattern))) - 1 for pattern in patterns], dtype=np.uint64)
+        iterations = np.zeros(len(lanes), dtype=np.int64)
+        iteration_counts = np.array([prbg.iteration_count for prbg in lanes], dtype=np.int64)
 
+        # Until a lane has seen as many bytes as its pattern, a partial window must not match
+        missing = np.array([len(pattern) - len(tail) for pattern, tail in zip(patterns, recent)], dtype=np.int64)
+        warmup = int(missing.max())
+
+        tmp = np.empty_like(states)
+        step = 0
+        while ids.size:
+            if ids.size < MULTI_MIN_LANES:
+                self._finish(lanes, ids, states, windows, masks, missing, iterations, step)
+                break
+            signed_states = states.view(np.int64)
+            signed_tmp = tmp.view(np.int64)
+            np.left_shift(states, np.uint64(13), out=tmp)
+            states ^= tmp
+            np.right_shift(signed_states, np.int64(17), out=signed_tmp)
+            states ^= tmp
+            np.left_shift(states, np.uint64(5), out=tmp)
+            states ^= tmp
+            windows <<= np.uint64(8)
+            windows |= states & np.uint64(0xFF)
+            windows &= masks
+            step += 1
+            matches = windows == pattern_values
+            if step < warmup:
+                matches &= missing <= step
+            hits = np.flatnonzero(matches)
+            if not hits.size:
+                continue
+
+            # Reseed: the new seed is made of the last 4 of the next 64 bytes
+            reseeds = states[hits]
+            for i in (2, 3, 4, 5):
+                reseeds = _apply_tables(_jump_table(i), reseeds)
+            seeds = np.zeros_like(reseeds)
+            for _ in range(4):
+                reseeds ^= reseeds << np.uint64(13)
+                reseeds ^= (reseeds.view(np.int64) >> np.int64(17)).view(np.uint64)
+                reseeds ^= reseeds << np.uint64(5)
+                seeds = (seeds << np.uint64(8)) | (reseeds & np.uint64(0xFF))
+            states[hits] = seeds
+            windows[hits] = pattern_values[hits]
+            iterations[hits] += 1
+
+            # Retire the lanes that completed their iterations
+            done = hits[iterations[hits] == iteration_counts[hits]]
+            if done.size:
+                for lane, seed in zip(ids[done], states[done]):
+                    prbg = lanes[lane]
+                    prbg.seed = prbg._wrap(_to_signed(int(seed)))
+                    prbg.buffer.buffer = list(prbg.consufion_pattern)
+                    prbg.setted_up = True
+                    prbg.bytes_searched = step
+                keep = np.ones(ids.size, dtype=bool)
+                keep[done] = False
+                ids, states, windows = ids[keep], states[keep], windows[keep]
+                pattern_values, masks, missing = pattern_values[keep], masks[keep], missing[keep]
+                iterations, iteration_counts = iterations[keep], iteration_counts[keep]
+                tmp = np.empty_like(states)
+
+    def _finish(self, lanes, ids, states, windows, masks, missing, iterations, step):
+        '''
+        Finishes the setup of the remaining lanes with their own setup(), from their current state,
+        window (the bytes seen, up to the pattern size) and completed iterations.
+        '''
+        for lane, s, window, mask, missing_bytes, completed in zip(ids, states, windows, masks, missing, iterations):
+            prbg = lanes[lane]
+            size = (int(mask).bit_length() + 7) // 8
+            seen = size - max(int(missing_bytes) - step, 0) if completed == 0 else size
+            prbg.seed = prbg._wrap(_to_signed(int(s)))
+            prbg.buffer.buffer = [prbg._wrap(b) for b in int(window).to_bytes(size, byteorder='big')[size - seen:]]
+            iteration_count = prbg.iteration_count
+            prbg.iteration_count = iteration_count - int(completed)
+            try:
+                prbg.setup()
+            finally:
+                prbg.iteration_count = iteration_count
+            prbg.bytes_searched += step
 
 
 class Buffer:
@@ -130,4 +1000,122 @@ class Buffer:
         self.buffer = []
 
     def __str__(self) -> str:
-        return str(self.buffer)
\ No newline at end of file
+        return str(self.buffer)
+
+class SetupStats:
+    '''
+    Instrumentation of a PRBG setup (see PRBG.setup): the bytes searched for the confusion pattern
+    and the time of each iteration, the number of reseeds, the iteration a checkpoint was resumed
+    from, and the total time (in seconds).
+    '''
+
+    def __init__(self) -> None:
+        self.iteration_bytes = []
+        self.iteration_times = []
+        self.reseeds = 0
+        self.resumed_from = 0
+        self.time = 0.0
+
+    def add_iteration(self, searched, seconds):
+        '''
+        Records an iteration, which ends with a reseed.
+        '''
+        self.iteration_bytes.append(searched)
+        self.iteration_times.append(seconds)
+        self.reseeds += 1
+
+    @property
+    def bytes_searched(self):
+        return sum(self.iteration_bytes)
+
+    def to_dict(self):
+        '''
+        Retrieves the statistics as a dict (e.g. to be saved as JSON).
+        '''
+        return {
+            'bytes_searched': self.bytes_searched,
+            'reseeds': self.reseeds,
+            'resumed_from': self.resumed_from,
+            'time': self.time,
+            'iteration_bytes': self.iteration_bytes,
+            'iteration_times': self.iteration_times
+        }
+
+
+class SetupCache:
+    '''
+    Bounded in-memory cache of set up generators, for services that set up the same generators
+    repeatedly. Entries are keyed by a HMAC-SHA256 digest (with a random per-cache key) of the password,
+    confusion string, iteration count and generator version, and only hold the post-setup state, so the inputs themselves
+    are never stored. The least recently used entries are evicted beyond max_size. It is thread safe.
+    '''
+
+    def __init__(self, max_size=128) -> None:
+        '''
+        Initializes an empty cache holding at most max_size setups.
+        '''
+        if max_size < 1:
+            raise ValueError(f"the cache size must be positive, got {max_size}")
+        self.max_size = max_size
+        self.salt = os.urandom(32)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, password, confusion_string, iteration_count, version=DEFAULT_VERSION):
+        '''
+        Computes the cache key of a setup.
+        '''
+        message = json.dumps([password, confusion_string, int(iteration_count), version]).encode()
+        return hmac.new(self.salt, message, sha256).digest()
+
+    def setup(self, password, confusion_string, iteration_count, backend='int', version=DEFAULT_VERSION, **kwargs):
+        '''
+        Returns a set up PRBG of the given parameters, restored from the cache if possible, or else set
+        up (with the given setup() arguments) and stored. Both behave identically.
+        '''
+        prbg = PRBG(password, confusion_string, iteration_count, backend, version)
+        key = self.key(password, confusion_string, iteration_count, version)
+        with self.lock:
+            seed = self.entries.get(key)
+            if seed is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if seed is not None:
+            prbg._restore(seed)
+            return prbg
+        prbg.setup(**kwargs)
+        with self.lock:
+            self.entries[key] = prbg._state()
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return prbg
+
+    def invalidate(self, password, confusion_string, iteration_count, version=DEFAULT_VERSION):
+        '''
+        Removes the setup of the given parameters from the cache, returning whether it was cached.
+        '''
+        key = self.key(password, confusion_string, iteration_count, version)
+        with self.lock:
+            return self.entries.pop(key, None) is not None
+
+    def clear(self):
+        '''
+        Removes all the setups from the cache (the counters are kept).
+        '''
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        '''
+        Retrieves the counters of the cache: size, max_size, hits and misses.
+        '''
+        with self.lock:
+            return {'size': len(self.entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self) -> int:
+        return len(self.entries)
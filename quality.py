@@ -0,0 +1,225 @@
+from prbg import PRBG
+import argparse
+import json
+import math
+import numpy as np
+import sys
+
+'''
+Default size (in bytes) of the chunks in which the analysed stream is consumed.
+'''
+CHUNK_SIZE = 1 << 20
+
+'''
+Number of set bits of each byte value, and number of bit transitions inside each byte value.
+'''
+ONES = np.array([bin(value).count('1') for value in range(256)], dtype=np.int64)
+TRANSITIONS = np.array([bin((value ^ (value >> 1)) & 0x7F).count('1') for value in range(256)], dtype=np.int64)
+
+
+def main():
+    '''
+    This application evaluates the statistical quality of a stream of pseudo-random bytes.
+    The bytes are either produced by a PRBG set up with the given password, confusion string and
+    iteration count (flags --pwd, --cs, --ic and --nob), or read from stdin until EOF. The stream is
+    consumed in chunks, in constant memory, and the results (histogram, chi-square, monobit and runs
+    tests, serial correlation and entropy) are printed or saved as JSON. The randomness image and the
+    byte histogram chart can be saved in the same pass.
+    '''
+
+    # Argument parser
+    parser = argparse.ArgumentParser(description='Deterministic RSA key generation (D-RSA): statistical quality')
+    parser.add_argument('--pwd', type=str, help='password (textual), read bytes from stdin if not given')
+    parser.add_argument('--cs', type=str, help='confusion string (textual)')
+    parser.add_argument('--ic', type=str, help='iteration count (number)')
+    parser.add_argument('--nob', type=int, help='number of bytes to analyse (number)')
+    parser.add_argument('--chunk', type=int, default=CHUNK_SIZE, help=f'chunk size in bytes (default: {CHUNK_SIZE})')
+    parser.add_argument('--json', type=str, help='file where the results are saved as JSON')
+    parser.add_argument('--image', type=str, help='file where the randomness image (1000x1000 RGB) is saved')
+    parser.add_argument('--histogram', type=str, help='file where the byte histogram chart is saved')
+    args = parser.parse_args()
+    if args.pwd is not None and (args.cs is None or args.ic is None or args.nob is None):
+        parser.error("--pwd requires --cs, --ic and --nob")
+
+    quality = Quality(image_size=(1000, 1000) if args.image is not None else None)
+    if args.pwd is not None:
+        prbg = PRBG(args.pwd, args.cs, args.ic)
+        prbg.setup()
+        analyze(prbg, args.nob, quality, args.chunk)
+    else:
+        while True:
+            chunk = sys.stdin.buffer.read(args.chunk)
+            if not chunk:
+                break
+            quality.update(chunk)
+
+    results = quality.results()
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    else:
+        for name, value in results.items():
+            if name != 'histogram':
+                print(f"{name}: {value}")
+    if args.image is not None:
+        quality.save_image(args.image)
+    if args.histogram is not None:
+        quality.save_histogram(args.histogram)
+
+
+def analyze(prbg, nob, quality=None, chunk_size=CHUNK_SIZE):
+    '''
+    Feeds the next NOB bytes of the generator to the given Quality accumulator (a new one if not
+    given), chunk by chunk, and returns it.
+    '''
+    if quality is None:
+        quality = Quality()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while nob > 0:
+        size = min(nob, chunk_size)
+        prbg.fill(view[:size])
+        quality.update(view[:size])
+        nob -= size
+    return quality
+
+
+class Quality:
+    '''
+    Streaming accumulator of statistics over a sequence of bytes. Only counters are kept between
+    chunks (plus, if requested, the first bytes of the stream, for the randomness image), so samples
+    of any size can be analysed in constant memory.
+    '''
+
+    def __init__(self, image_size=None) -> None:
+        '''
+        Initializes the counters. If an image size (width, height) is given, the first width*height*3
+        bytes are also kept as the pixels of a RGB image.
+        '''
+        self.count = 0
+        self.histogram = np.zeros(256, dtype=np.int64)
+        self.transitions = 0
+        self.serial_sum = 0
+        self.first_byte = None
+        self.last_byte = None
+        self.image_size = image_size
+        self.image = None
+        self.image_filled = 0
+        if image_size is not None:
+            width, height = image_size
+            self.image = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def update(self, chunk):
+        '''
+        Updates the statistics with the next chunk of the stream.
+        '''
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        if data.size == 0:
+            return
+        if self.first_byte is None:
+            self.first_byte = int(data[0])
+
+        counts = np.bincount(data, minlength=256)
+        self.histogram += counts
+
+        # Bit transitions inside each byte only depend on its value, so they are counted from the
+        # chunk histogram; the ones between consecutive bytes are between the LSB and the next MSB
+        self.transitions += int(np.dot(counts, TRANSITIONS))
+        self.transitions += int(np.count_nonzero((data[:-1] & 1) != (data[1:] >> 7)))
+
+        # Sum of the products of consecutive bytes, for the serial correlation
+        values = data.astype(np.int64)
+        self.serial_sum += int(np.dot(values[:-1], values[1:]))
+        if self.last_byte is not None:
+            self.serial_sum += self.last_byte * int(data[0])
+            self.transitions += int((self.last_byte & 1) != (int(data[0]) >> 7))
+        self.last_byte = int(data[-1])
+
+        if self.image is not None and self.image_filled < self.image.size:
+            size = min(self.image.size - self.image_filled, data.size)
+            self.image.reshape(-1)[self.image_filled:self.image_filled + size] = data[:size]
+            self.image_filled += size
+
+        self.count += data.size
+
+    def results(self):
+        '''
+        Computes the statistics of all the bytes seen so far, with the p-values of the tests.
+        '''
+        n = self.count
+        bits = 8 * n
+        results = {'bytes': n, 'histogram': self.histogram.tolist()}
+        if n == 0:
+            return results
+
+        # Chi-square of the byte histogram against the uniform distribution (255 degrees of freedom)
+        expected = n / 256
+        chi_square = float(np.sum((self.histogram - expected) ** 2) / expected)
+        results['chi_square'] = chi_square
+        results['chi_square_p'] = chi_square_p(chi_square, 255)
+
+        # Monobit (frequency) test
+        ones = int(np.dot(self.histogram, ONES))
+        results['ones_ratio'] = ones / bits
+        results['monobit_p'] = math.erfc(abs(2 * ones - bits) / math.sqrt(2 * bits))
+
+        # Runs test (only meaningful if the monobit proportion is close enough to 1/2)
+        pi = ones / bits
+        runs = self.transitions + 1
+        if abs(pi - 0.5) < 2 / math.sqrt(bits):
+            deviation = abs(runs - 2 * bits * pi * (1 - pi)) / (2 * math.sqrt(2 * bits) * pi * (1 - pi))
+            results['runs_p'] = math.erfc(deviation)
+        else:
+            results['runs_p'] = 0.0
+        results['runs'] = runs
+
+        # Serial correlation coefficient of consecutive bytes (the last byte wraps to the first one)
+        values = np.arange(256, dtype=np.int64)
+        total = int(np.dot(self.histogram, values))
+        squares = int(np.dot(self.histogram, values * values))
+        products = self.serial_sum + self.last_byte * self.first_byte
+        denominator = n * squares - total * total
+        results['serial_correlation'] = (n * products - total * total) / denominator if denominator else 1.0
+        results['mean'] = total / n
+
+        # Shannon and min-entropy estimates, in bits per byte
+        probabilities = self.histogram[self.histogram > 0] / n
+        results['entropy'] = float(-np.sum(probabilities * np.log2(probabilities)))
+        results['min_entropy'] = float(-math.log2(probabilities.max()))
+        return results
+
+    def save_image(self, path):
+        '''
+        Saves the first bytes of the stream as a RGB image.
+        '''
+        from PIL import Image
+
+        Image.fromarray(self.image, 'RGB').save(path)
+
+    def save_histogram(self, path):
+        '''
+        Saves the chart of the byte histogram.
+        '''
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots( nrows=1, ncols=1 )
+        ax.set_title(f"Distribution of values of {self.count} bytes")
+        ax.set_ylabel("Ammount")
+        ax.set_xlabel("Byte value (0-255)")
+        ax.bar(range(256), self.histogram)
+        fig.savefig(path)
+        plt.close(fig)
+
+
+def chi_square_p(x, k):
+    '''
+    Upper tail probability of the chi-square distribution with k degrees of freedom, using the
+    Wilson-Hilferty normal approximation (accurate for large k, such as 255).
+    '''
+    z = ((x / k) ** (1 / 3) - (1 - 2 / (9 * k))) / math.sqrt(2 / (9 * k))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,34 @@
-from prbg import PRBG
+from prbg import DEFAULT_VERSION, VERSIONS, PRBG, PRBGStream
 import argparse
-import matplotlib.pyplot as plt
+import json
+import mmap
 import time
 import random
 import string
-import numpy as np
-from PIL import Image
+import os
 import sys
 
+'''
+Size (in bytes) of the blocks generated and written at once when outputting bytes.
+'''
+OUTPUT_BLOCK = 1 << 20
+
 def main():
     '''
     This application implements the Pseudo-random Byte Generator (PRBG).
     It may do one of two things:
     - Perform benchmarking of the PRBG setup - uses random passwords, confusion strings and iteration
       counters to test the setup of the generator, and produces a number of different statistics to the
-      statistics folder. For that, only the flag --benchmark is needed. It may take a long time.
+      statistics folder. For that, only the flag --benchmark is needed. It may take a long time. The setup
+      benchmark itself is implemented (and can be configured) in the benchmark module.
     - Output NOB or infinite number of pseudo-random bytes to stdout - using the given password, confusion
       string and iteration count. For that, the flags --pwd, --cs, --ic, and --nob are needed. It NOB < 1,
-      the program will output an infine number of bytes.
+      the program will output an infine number of bytes. With --checkpoint, the setup progress is
+      periodically saved to the given file, and a later run with the same parameters resumes from it.
+      The file is removed when the setup finishes, unless --keep-checkpoint is given.
+      With --out, the bytes are written to the given file instead of stdout, and with --jobs N the
+      file is generated by N worker processes in parallel. With --generator, the bytes are produced by
+      the given version of the generator (see prbg.GENERATORS).
     '''
 
     # Argument parser
@@ -26,8 +37,16 @@ def main():
     parser.add_argument('--cs', required='--benchmark' not in sys.argv, type=str, help='confusion string (textual)')
     parser.add_argument('--ic', required='--benchmark' not in sys.argv, type=str, help='iteration count (number)')
     parser.add_argument('--nob', required='--benchmark' not in sys.argv, type=int, help='number of bytes to output (number)')
+    parser.add_argument('--generator', choices=VERSIONS, default=DEFAULT_VERSION, help=f'version of the generator (default: {DEFAULT_VERSION})')
     parser.add_argument('--benchmark', action='store_true', help='Perform benchmarking with random parameters')
+    parser.add_argument('--out', type=str, help='file where the bytes are written (default: stdout)')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes that generate the --out file in parallel (default: 1)')
+    parser.add_argument('--checkpoint', type=str, help='file where the setup progress is saved, and resumed from if it exists')
+    parser.add_argument('--checkpoint-interval', type=float, default=60, help='seconds between setup checkpoints (default: 60)')
+    parser.add_argument('--keep-checkpoint', action='store_true', help='keep the checkpoint file with the final state after the setup, so that later runs skip it')
     args = parser.parse_args()
+    if args.jobs > 1 and (args.out is None or args.nob < 1):
+        parser.error("--jobs requires --out and a finite --nob")
 
     # Generate random password
     password = get_random_string(10)
@@ -35,118 +54,123 @@ def main():
 
     # Compute benchmarks
     if args.benchmark:
-        
+        # Only loaded here, so that generating bytes doesn't pay for the imports of the benchmark, the
+        # statistics (NumPy) and the charts
+        import benchmark
+        from quality import Quality, analyze
+
         # plot charts ilustrating the contribution of the two input parameters:
         # - confusion string and number of iterations
         # to the setup time of the pseudo-random number generator
+        # (see benchmark.py for the repetitions, seed, baseline comparison...)
 
         print("Task: Plot charts comparing the setup time for different cs and ic.")
-        f = open(f"statistics/times-{time.strftime('%Y-%m-%d_%H-%M-%S', time.gmtime())}.txt", "w")
-        data_ic = [[],[],[],[],[],[],[]]
-        for cs_size in range(3):
-            data_cs = []
-            for count, ic in enumerate([1, 5, 10, 20, 50, 100, 200]):
-
-                # Generator init
-                prbg = PRBG(password, get_random_string(cs_size+1), ic)
-                print(f"  Setting gen up for cs_len={cs_size+1} and ic={ic}")
-
-                # Count setup time
-                start_time = time.time()
-                prbg.setup()
-                tot_time = time.time() - start_time
-
-                # Save data for later plot
-                data_cs.append([ic, tot_time])
-                data_ic[count].append([cs_size+1, tot_time])
-
-                # Write to times file
-                f.write(f"cs_size={cs_size+1}\tic={ic}\ttime={tot_time}\n")
-            
-            # Plot Time per iteration
-            fig, ax = plt.subplots( nrows=1, ncols=1 )
-            ax.set_title(f"Time per iteration, for confusion string size={cs_size+1}")
-            ax.set_ylabel("Time (seconds)")
-            ax.set_xlabel("Iteration count")
-            #ax.set_yscale('log')
-            ax.scatter([tpl[0] for tpl in data_cs], [tpl[1] for tpl in data_cs])
-            fig.savefig(f'statistics/t_per_ic_cs{cs_size+1}.png')
-            plt.close(fig)
-        
-        f.write(f"\nFinished. {time.strftime('%Y-%m-%d_%H-%M-%S', time.gmtime())}")
-        f.close()
-
-        # Plot Time per confusion string size
-        for count, ic_data in enumerate([1, 5, 10, 20, 50, 100, 200]):
-            fig, ax = plt.subplots( nrows=1, ncols=1 )
-            ax.set_title(f"Time per confusion string size, for iteration count={ic_data}")
-            ax.set_ylabel("Time (seconds)")
-            ax.set_xlabel("Confusion string size")
-            #ax.set_yscale('log')
-            ax.scatter([tpl[0] for tpl in data_ic[count]], [tpl[1] for tpl in data_ic[count]])
-            fig.savefig(f'statistics/t_per_cs_ic{ic_data}.png')
-            plt.close(fig)
-            
+        cells = benchmark.run_benchmark()
+        stamp = time.strftime('%Y-%m-%d_%H-%M-%S', time.gmtime())
+        benchmark.write_json(f"statistics/times-{stamp}.json", cells)
+        benchmark.write_csv(f"statistics/times-{stamp}.csv", cells)
+        benchmark.plot_times(cells, "statistics")
+
+        # Generator for the statistical info (any set up generator will do)
+        prbg = PRBG(password, get_random_string(1), 1)
+        prbg.setup()
+
         # Statistical info
         print("Task: Plot statistical info - randomness and byte distribution")
         print(prbg)
 
         height = 1000
         width = 1000
-        im = Image.new("RGB", (width,height))
-        im = np.array(im)
-
-        hist_dict = dict()
-        buffer = []
-        
-        for i in range(width):
-            for k in range (height):
-                
-                # Add 3 bytes to image buffer
-                buffer.append(prbg.next_byte())
-                buffer.append(prbg.next_byte())
-                buffer.append(prbg.next_byte())
-
-                # Add previous 3 bytes to the histogram
-                for b in buffer:
-                    if b in hist_dict:
-                        hist_dict[b] += 1
-                    else:
-                        hist_dict[b] = 1
-
-                im[i][k] = buffer
-                buffer = []
+
+        # Compute the statistics of the bytes, keeping the first ones as the pixels of the image
+        quality = analyze(prbg, width*height*3, Quality(image_size=(width, height)))
+        results = quality.results()
+        for name in ('chi_square_p', 'monobit_p', 'runs_p', 'serial_correlation', 'entropy'):
+            print(f"  {name}: {results[name]}")
+        with open(f"statistics/quality_{width*height*3}.json", "w") as f:
+            json.dump(results, f, indent=2)
 
         # Save randomness image
-        print(f"  Saving randomness in statistics/hist_{width*height*3}_bytes.png...", end="")
-        img = Image.fromarray(im, 'RGB')
-        img.save(f"statistics/randomness_{width*height*3}.png")
+        print(f"  Saving randomness in statistics/randomness_{width*height*3}.png...", end="")
+        quality.save_image(f"statistics/randomness_{width*height*3}.png")
         print("done.")
 
         # Save histogram
-        print(f"  Saving byte histogram in statistics/randomness_{width*height*3}.png...", end="")
-        fig, ax = plt.subplots( nrows=1, ncols=1 )
-        ax.set_title(f"Distribution of values of {width*height*3} bytes")
-        ax.set_ylabel("Ammount")
-        ax.set_xlabel("Byte value (0-255)")
-        ax.bar([i for i in hist_dict],[hist_dict[i] for i in hist_dict])
-        fig.savefig(f'statistics/hist_{width*height*3}_bytes.png')
+        print(f"  Saving byte histogram in statistics/hist_{width*height*3}_bytes.png...", end="")
+        quality.save_histogram(f'statistics/hist_{width*height*3}_bytes.png')
         print("done.")
-        plt.close(fig)
 
     # stdout bytes
     else:
-        prbg = PRBG(args.pwd, args.cs, args.ic)
-        prbg.setup()
-
-        # Output given number of bytes
-        if args.nob >= 1:
-            for _ in range(args.nob):
-                sys.stdout.buffer.write(prbg.next_byte().item().to_bytes(1,byteorder='big'))
-        # Output bytes forever
+        prbg = PRBG(args.pwd, args.cs, args.ic, version=args.generator)
+        prbg.setup(checkpoint=args.checkpoint, checkpoint_interval=args.checkpoint_interval, keep_checkpoint=args.keep_checkpoint)
+
+        # Output given number of bytes, or bytes forever if NOB < 1
+        nob = args.nob if args.nob >= 1 else None
+        if args.jobs > 1:
+            write_bytes_parallel(prbg, args.out, nob, args.jobs)
+        elif args.out is not None:
+            with open(args.out, "wb") as f:
+                write_bytes(prbg, f, nob)
         else:
-            while True:
-                sys.stdout.buffer.write(prbg.next_byte().item().to_bytes(1,byteorder='big'))
+            try:
+                write_bytes(prbg, sys.stdout.buffer, nob)
+                sys.stdout.flush()
+            except BrokenPipeError:
+                # The consumer closed the pipe early (e.g. head -c): stop quietly, and point stdout
+                # to devnull so that the interpreter doesn't fail again when flushing it at exit
+                devnull = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull, sys.stdout.fileno())
+                sys.exit(1)
+
+def write_bytes(prbg, file, nob=None):
+    '''
+    Writes the next NOB bytes of the generator (or bytes forever, if NOB is None) to the given binary
+    file, generating and writing them in blocks of OUTPUT_BLOCK bytes.
+    '''
+    buffer = bytearray(OUTPUT_BLOCK)
+    view = memoryview(buffer)
+    while nob is None or nob > 0:
+        size = OUTPUT_BLOCK if nob is None else min(nob, OUTPUT_BLOCK)
+        prbg.fill(view[:size])
+        file.write(view[:size])
+        if nob is not None:
+            nob -= size
+
+def write_bytes_parallel(prbg, path, nob, jobs):
+    '''
+    Writes the next NOB bytes of the generator to the given file using a pool of worker processes.
+    The file is preallocated and split in segments (aligned to the mmap allocation granularity); each
+    worker jumps to the start of its segment and fills it through a memory map. The result is identical
+    to the sequential output, and the generator is left as if it had produced the NOB bytes.
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+
+    with open(path, "wb") as f:
+        f.truncate(nob)
+    granularity = mmap.ALLOCATIONGRANULARITY
+    segment = -(-nob // (4 * jobs))
+    segment = max(granularity, -(-segment // granularity) * granularity)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(_write_segment, prbg, path, offset, min(segment, nob - offset))
+            for offset in range(0, nob, segment)
+        ]
+        for future in futures:
+            future.result()
+    prbg.jump(nob)
+
+
+def _write_segment(prbg, path, offset, size):
+    '''
+    Worker of write_bytes_parallel: fills the bytes [offset, offset + size) of the file with the bytes
+    at the same offsets of the generator stream.
+    '''
+    stream = PRBGStream(prbg)
+    stream.seek(offset)
+    with open(path, "r+b") as f, mmap.mmap(f.fileno(), size, offset=offset) as mm:
+        stream.readinto(mm)
+
 
 def get_random_string(length):
     '''
@@ -1,7 +1,8 @@
 import argparse
+import json
 import sys
 from drsa import DRSA
-import rsa
+from pkcs1 import export_pem
 import os
 
 def main():
@@ -9,50 +10,87 @@ def main():
     This application implements the DRSA module.
     It receives the first N pseudo-random bytes from the stdin, which are used
     to generate deterministic private and public parameters for an RSA key.
-    The parameters are then used to convert the key pair to the PEM format,
-    using an external library (rsa). The keys are then exported to a file with the
-    given name.
+    By default all the bytes until EOF are used; with --bits (or --nob), exactly the
+    bytes needed are read and the stdin is then closed, so it can be an infinite stream.
+    The parameters are then used to convert the key pair to the PKCS#1 format, PEM
+    encoded (see the pkcs1 module). The keys are then exported to a file with the
+    given name. With --generator, the version of the generator that produced the bytes is
+    recorded in the metadata file of the keys (see save_keys).
     '''
 
     # Argument parser
     parser = argparse.ArgumentParser(description='Deterministic RSA key generation (D-RSA): rsagen')
     parser.add_argument('kn', type=str, help='key name')
+    parser.add_argument('--parallel', action='store_true', help='search for the primes p and q concurrently')
+    parser.add_argument('--generator', type=str, help='version of the generator of the input bytes, recorded in <kn>_meta.json')
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument('--bits', type=int, help='key size in bits, a multiple of 16 (reads BITS/8 bytes)')
+    size.add_argument('--nob', type=int, help='number of bytes to read from stdin (number)')
     args = parser.parse_args()
+    if args.bits is not None and (args.bits <= 0 or args.bits % 16 != 0):
+        parser.error("--bits must be a positive multiple of 16")
+    if args.nob is not None and args.nob <= 0:
+        parser.error("--nob must be positive")
 
-    # Read bytes from stdin
-    seed = sys.stdin.buffer.read()
+    # Read bytes from stdin: all of them, or exactly the given amount
+    if args.bits is None and args.nob is None:
+        seed = sys.stdin.buffer.read()
+    else:
+        nob = args.nob if args.nob is not None else args.bits // 8
+        seed = read_seed(sys.stdin.buffer, nob)
+        if len(seed) < nob:
+            parser.error(f"expected {nob} bytes from stdin, got {len(seed)}")
+        # Close the read end of the pipe now (sys.stdin.close() keeps fd 0 open), so that the producer
+        # stops at once, and point fd 0 to devnull so that it is not reused by the files opened later
+        sys.stdin.close()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.close(devnull)
 
     # Retrieve key name from user args
     key_name = args.kn
 
     # DRSA instance and retrieve parameters
-    my_rsa = DRSA(seed)
+    my_rsa = DRSA(seed, parallel=args.parallel)
 
-    # Create PublicKey object to export to PEM, from
-    # params calculated by DRSA
-    n, e = my_rsa.get_public_params()
-    publicKey = rsa.PublicKey(n, e)
+    # Export the key pair in PKCS#1 format, PEM encoded, and save it
+    publicKeyPkcs1PEM, privateKeyPkcs1PEM = export_pem(my_rsa)
+    metadata = {'version': args.generator} if args.generator is not None else None
+    save_keys(key_name, publicKeyPkcs1PEM, privateKeyPkcs1PEM, metadata)
 
-    # Create PrivateKey object to export to PEM, from
-    # params calculated by DRSA
-    n, e, d, p, q = my_rsa.get_private_params()
-    privateKey = rsa.PrivateKey(n, e, d, p, q)
-
-    # Export public key in PKCS#1 format, PEM encoded 
-    publicKeyPkcs1PEM = publicKey.save_pkcs1().decode('utf8') 
-
-    # Export private key in PKCS#1 format, PEM encoded 
-    privateKeyPkcs1PEM = privateKey.save_pkcs1().decode('utf8')
+def read_seed(file, nob):
+    '''
+    Reads exactly NOB bytes from the given binary file (fewer only if it ends before), without
+    waiting for its end, so that it can be an infinite stream.
+    '''
+    seed = bytearray(nob)
+    view = memoryview(seed)
+    read = 0
+    while read < nob:
+        count = file.readinto(view[read:])
+        if not count:
+            break
+        read += count
+    return bytes(seed[:read])
 
-    # Save the PEM encoded keys
-    f_pub = open(f"{key_name}_pub_key.pem", "w")
-    f_pub.write(publicKeyPkcs1PEM)
+def save_keys(key_name, publicKeyPkcs1PEM, privateKeyPkcs1PEM, metadata=None):
+    '''
+    Saves the PEM encoded keys to the files <key name>_pub_key.pem and <key name>_priv_key.pem. If a
+    metadata dict is given (such as the version of the generator), it is saved to <key name>_meta.json,
+    since the PEM files themselves can't hold it.
+    '''
+    with open(f"{key_name}_pub_key.pem", "wb") as f_pub:
+        f_pub.write(publicKeyPkcs1PEM)
     #os.chmod(f"{key_name}_pub_key.pem", 400) # Give appropriate permissions
 
-    f_priv = open(f"{key_name}_priv_key.pem", "w")
-    f_priv.write(privateKeyPkcs1PEM)
-    f_priv.close()
+    with open(f"{key_name}_priv_key.pem", "wb") as f_priv:
+        f_priv.write(privateKeyPkcs1PEM)
     #os.chmod(f"{key_name}_priv_key.pem", 400) # Give appropriate permissions
 
+    if metadata is not None:
+        with open(f"{key_name}_meta.json", "w") as f_meta:
+            json.dump(metadata, f_meta)
+            f_meta.write('\n')
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
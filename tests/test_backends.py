@@ -0,0 +1,90 @@
+from prbg import BACKENDS, VECTOR_MIN_BYTES, PRBG
+from hashlib import sha256
+import pytest
+
+pytest.importorskip("numpy")
+
+'''
+Golden vectors of the original implementation (np.int64 arithmetic, byte by byte): password, confusion
+string, iteration count, initial seed, post-setup seed, post-setup buffer, SHA-256 digests of the
+first 20000 and 100000 bytes generated after the setup, and the 16 bytes at offset 123456 (hex).
+'''
+VECTORS = [
+    ('ola', 'o', 2, 2820364181, 3298156017, [249], '3c6b21133ae81c90e5b905c5145cd4c9ea9b81eda0de515b2ec34ade74e1872a', 'fbcb28125d3212cfae20a7f7245abaa7d487c5db232cb8544ec852c2b1bf830c', 'b5e0a0ef9130d520d047b6a25430c644'),
+    ('pw', 'cd', 3, 3719092692, 532212648, [180, 82], '71691734d1194245c9380991cade54dd557790b526e4402e3b049815949239f8', '75fc3501fe1886270756a0ae17d78f91519e8f0b2f39636b3245ad7df8a3f2b0', 'b1baaf7d4cf0389b19dcfe5e3e540041'),
+    ('pw215', 'abc', 1, 1710687544, 3727202039, [97, 163, 150], '23616622f14f81c7b7356a7c4f70e472447cbaa64e211f735dd0eea58aca1322', '1e93a2689641c50ed93220242997e86051eb3b1d47adce1b6d16aab449ff05ec', '6281f512e9df6339fb50f15815a6729d'),
+]
+
+JUMP_OFFSET = 123456
+
+
+def set_up(password, confusion_string, iteration_count, backend):
+    prbg = PRBG(password, confusion_string, str(iteration_count), backend)
+    prbg.setup()
+    return prbg
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("password, confusion_string, iteration_count, initial, seed, buffer, digest, long_digest, at_offset", VECTORS)
+def test_setup(backend, password, confusion_string, iteration_count, initial, seed, buffer, digest, long_digest, at_offset):
+    prbg = PRBG(password, confusion_string, str(iteration_count), backend)
+    assert int(prbg.seed) == initial
+    prbg.setup()
+    assert int(prbg.seed) == seed
+    assert [int(b) for b in prbg.buffer.buffer] == buffer
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("password, confusion_string, iteration_count, initial, seed, buffer, digest, long_digest, at_offset", VECTORS)
+def test_next_byte(backend, password, confusion_string, iteration_count, initial, seed, buffer, digest, long_digest, at_offset):
+    prbg = set_up(password, confusion_string, iteration_count, backend)
+    assert sha256(bytes(int(prbg.next_byte()) for _ in range(20000))).hexdigest() == digest
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("password, confusion_string, iteration_count, initial, seed, buffer, digest, long_digest, at_offset", VECTORS)
+def test_next_bytes(backend, password, confusion_string, iteration_count, initial, seed, buffer, digest, long_digest, at_offset):
+    prbg = set_up(password, confusion_string, iteration_count, backend)
+    assert sha256(prbg.next_bytes(20000)).hexdigest() == digest
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("password, confusion_string, iteration_count, initial, seed, buffer, digest, long_digest, at_offset", VECTORS)
+def test_fill_across_vector_threshold(backend, password, confusion_string, iteration_count, initial, seed, buffer, digest, long_digest, at_offset):
+    # A single large fill (vectorized), then fills just below and above the threshold, must continue
+    # the same stream
+    sizes = [100000 - 2 * VECTOR_MIN_BYTES, VECTOR_MIN_BYTES - 1, VECTOR_MIN_BYTES + 1]
+    prbg = set_up(password, confusion_string, iteration_count, backend)
+    whole = bytearray(100000)
+    assert prbg.fill(whole) == 100000
+    assert sha256(whole).hexdigest() == long_digest
+    after = prbg.next_bytes(16)
+
+    prbg = set_up(password, confusion_string, iteration_count, backend)
+    parts = bytearray()
+    for size in sizes:
+        part = bytearray(size)
+        prbg.fill(memoryview(part))
+        parts += part
+    assert parts == whole
+    assert prbg.next_bytes(16) == after
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("password, confusion_string, iteration_count, initial, seed, buffer, digest, long_digest, at_offset", VECTORS)
+def test_jump(backend, password, confusion_string, iteration_count, initial, seed, buffer, digest, long_digest, at_offset):
+    prbg = set_up(password, confusion_string, iteration_count, backend)
+    prbg.jump(JUMP_OFFSET)
+    assert prbg.next_bytes(16).hex() == at_offset
+
+    prbg = set_up(password, confusion_string, iteration_count, backend)
+    prbg.next_bytes(1000)
+    prbg.jump(JUMP_OFFSET - 1000)
+    assert bytes(int(prbg.next_byte()) for _ in range(16)).hex() == at_offset
+
+
+def test_backends_keep_their_state_type():
+    import numpy as np
+
+    assert isinstance(set_up('ola', 'o', 2, 'numpy').seed, np.int64)
+    assert isinstance(set_up('ola', 'o', 2, 'int').seed, int)
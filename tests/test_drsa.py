@@ -0,0 +1,52 @@
+from drsa import DRSA, PrimeStats, next_prime
+import drsa
+import gmpy2
+import random
+import pytest
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+@pytest.mark.parametrize("bits", [4, 12, 18, 19, 64, 512, 1100])
+def test_next_prime_with_stats(monkeypatch, enabled, bits):
+    monkeypatch.setattr(drsa, 'SIEVE_ENABLED', enabled)
+    rng = random.Random(bits)
+    for _ in range(10):
+        n = rng.getrandbits(bits)
+        stats = PrimeStats()
+        assert next_prime(n, stats) == next_prime(n) == gmpy2.next_prime(n)
+        assert stats.searches == 1
+        # The stats don't change the search: only the sieved searches count their candidates
+        if enabled and bits >= drsa.SIEVE_MIN_BITS:
+            assert stats.delegated == 0 and stats.windows > 0 and stats.candidates > 0
+        else:
+            assert stats.delegated == 1 and stats.windows == stats.candidates == 0
+
+
+@pytest.mark.parametrize("bits", [512, 1024, 2048])
+def test_stats_do_not_change_keys(bits):
+    seed = random.Random(bits).randbytes(bits // 8)
+    stats = PrimeStats()
+    keys = DRSA(seed, stats=stats)
+    assert stats.searches > 0 and len(stats.times) == 2
+    assert keys.get_private_params() == DRSA(seed).get_private_params()
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_next_prime_sieve_setting(monkeypatch, enabled):
+    monkeypatch.setattr(drsa, 'SIEVE_ENABLED', enabled)
+    rng = random.Random(1100)
+    for _ in range(5):
+        n = rng.getrandbits(1100)
+        assert next_prime(n) == gmpy2.next_prime(n)
+
+
+def test_parallel_search_uses_processes():
+    from concurrent.futures import ProcessPoolExecutor
+
+    with drsa.prime_executor() as executor:
+        assert isinstance(executor, ProcessPoolExecutor)
+    seed = random.Random(0).randbytes(128)
+    stats = PrimeStats()
+    keys = DRSA(seed, parallel=True, stats=stats)
+    assert keys.get_private_params() == DRSA(seed).get_private_params()
+    assert len(stats.times) == 2
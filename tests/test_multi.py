@@ -0,0 +1,41 @@
+from prbg import MULTI_MIN_LANES, MultiPRBG, PRBG
+import random
+import pytest
+
+pytest.importorskip("numpy")
+
+
+def make_lanes(count, seed):
+    '''
+    Lanes with confusion strings of 1 and 2 characters, several iteration counts, and about a third of
+    them with bytes already in their buffer before the setup (possibly fewer than the pattern size).
+    '''
+    rng = random.Random(seed)
+    lanes = []
+    for i in range(count):
+        confusion_string = ''.join(rng.choice('abcdefgh') for _ in range(rng.choice([1, 1, 2])))
+        iteration_count = rng.choice([1, 2, 3]) if len(confusion_string) == 2 else rng.choice([1, 2, 5, 20])
+        prefilled = rng.randint(1, len(confusion_string)) if rng.randrange(3) == 0 else 0
+        lanes.append((f'pw{seed}-{i}', confusion_string, str(iteration_count), prefilled))
+    return lanes
+
+
+def make_prbg(password, confusion_string, iteration_count, prefilled):
+    prbg = PRBG(password, confusion_string, iteration_count)
+    for _ in range(prefilled):
+        prbg.buffer.add(prbg.next_byte())
+    return prbg
+
+
+@pytest.mark.parametrize("count", [MULTI_MIN_LANES // 2, 2 * MULTI_MIN_LANES + 10])
+def test_multi_setup_matches_setup(count):
+    lanes = make_lanes(count, count)
+    multi = [make_prbg(*lane) for lane in lanes]
+    MultiPRBG(multi).setup()
+    for lane, prbg in zip(lanes, multi):
+        single = make_prbg(*lane)
+        single.setup()
+        assert int(prbg.seed) == int(single.seed), lane
+        assert [int(b) for b in prbg.buffer.buffer] == [int(b) for b in single.buffer.buffer], lane
+        assert prbg.setted_up and prbg.bytes_searched == single.bytes_searched, lane
+        assert prbg.next_bytes(64) == single.next_bytes(64), lane
@@ -0,0 +1,27 @@
+from derive import derive_drsa
+from drsa import DRSA
+from pkcs1 import export_pem
+from pathlib import Path
+import random
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_export_pem_matches_committed_keys():
+    # The python_512 key pair of the README (randgen --pwd ola --cs o --ic 2 --nob 512 | rsagen)
+    public_pem, private_pem = export_pem(derive_drsa('ola', 'o', '2', 4096))
+    assert public_pem == (ROOT / "python_512_pub_key.pem").read_bytes()
+    assert private_pem == (ROOT / "python_512_priv_key.pem").read_bytes()
+
+
+@pytest.mark.parametrize("bits", [512, 1024, 2048, 4096])
+def test_export_pem_matches_rsa(bits):
+    rsa = pytest.importorskip("rsa")
+    rng = random.Random(bits)
+    for _ in range(3):
+        keys = DRSA(rng.randbytes(bits // 8))
+        n, e, d, p, q = (int(value) for value in keys.get_private_params())
+        public_pem, private_pem = export_pem(keys)
+        assert public_pem == rsa.PublicKey(n, e).save_pkcs1()
+        assert private_pem == rsa.PrivateKey(n, e, d, p, q).save_pkcs1()
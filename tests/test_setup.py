@@ -0,0 +1,75 @@
+from prbg import PRBG
+import pytest
+
+'''
+Reference vectors of the original byte-by-byte setup (the baseline implementation, with np.int64
+arithmetic): password, confusion string, iteration count, initial seed, post-setup seed, post-setup
+buffer, and the first 64 bytes generated after the setup (hex). The passwords of the 3-byte confusion
+strings were chosen so that their pattern is found quickly, which keeps the legacy loop fast.
+'''
+VECTORS = [
+    ('ola', 'o', 1, 1266605896, 4066283394, [249], 'f50aa7a6ba3d83f1704fd92106f4e98ba9ea1a407ea9016acd2d52015ecd2c273fad626f430d12dc819dc3182688c4872a2b1f268544aeecbf9abd220e4d3849'),
+    ('ola', 'o', 2, 2820364181, 3298156017, [249], 'e477a7333d58f249ad97fd9c4f1163b11f7d26c98185ff02606e63cef10bfd3e6335d4749f95e5d094b89ef70fee613ed816eb176134e5cc6c17c4d306d1859a'),
+    ('pw', 'q', 5, 856713615, 2552423499, [130], 'dea903b93f5133a81c8db457219926df19dbbd1d7701f87dfadc1c3bfea56410bd66a7529281f00cb5436434ca53bbb3a603eddcf6276a8ac5c632eab933b27b'),
+    ('key', 'z', 20, 682042333, 2835149329, [36], '8eca2bf655aa2ae1ae02489580563d0a9c554d4ca1e44ce799efbc36377b69db4b2c1671fd4f1e4f7b91d4c4762fce91a6f1eab24ba5ed0ffb3199a57ddfda6c'),
+    ('ola', 'ab', 1, 978563834, 3771097766, [96, 195], '0f5b50bde177385ca64085a3464f7cbee2fc1eb5b813613e9805bd8d0e4f3648569a8886fd37a234faf9e05f8e5aeec5ab30f1b7f3e4311cbd48073767d124ac'),
+    ('pw', 'cd', 3, 3719092692, 532212648, [180, 82], '0ea361085e0cc4aeda1269eee45ba24d6631969c3e5256455eba65e68379c890692da5d5e8a172c088d44c620c0e480482dd0836fea7fb99267767d67bcae265'),
+    ('pw215', 'abc', 1, 1710687544, 3727202039, [97, 163, 150], '0c3fa51311e2a540ec732b4de74e5d331fe9365047a516524b57de21c846ad824e771c1b86f98325ecbf93ae7509c3d310b313978be62ed2ec278091cbdee437'),
+    ('pw22735', 'xyz', 2, 3544692606, 2956068916, [146, 192, 180], '6edcb5325c9dbf6daef7414b85f9b2f953e10bce506c611aa4d95686cd5f7483fc0bd7efa945c9954a707c9c3a56edda980bd8a93929f6af4893272f63dac319'),
+]
+
+
+@pytest.mark.parametrize("password, confusion_string, iteration_count, initial, seed, buffer, stream", VECTORS)
+def test_setup_matches_reference(password, confusion_string, iteration_count, initial, seed, buffer, stream):
+    prbg = PRBG(password, confusion_string, str(iteration_count))
+    assert int(prbg.seed) == initial
+    prbg.setup()
+    assert int(prbg.seed) == seed
+    assert [int(b) for b in prbg.buffer.buffer] == buffer
+    assert prbg.setted_up
+    assert prbg.next_bytes(64).hex() == stream
+
+
+@pytest.mark.parametrize("password, confusion_string, iteration_count, initial, seed, buffer, stream", VECTORS)
+def test_setup_matches_legacy(password, confusion_string, iteration_count, initial, seed, buffer, stream):
+    fast = PRBG(password, confusion_string, str(iteration_count))
+    fast.setup()
+    legacy = PRBG(password, confusion_string, str(iteration_count))
+    legacy._setup_legacy()
+    assert int(fast.seed) == int(legacy.seed)
+    assert [int(b) for b in fast.buffer.buffer] == [int(b) for b in legacy.buffer.buffer]
+    assert fast.next_bytes(64) == bytes(legacy.next_byte() for _ in range(64))
+
+
+def test_setup_resumes_partial_buffer():
+    # Bytes already seen before the setup take part in the first match, as in the legacy loop
+    fast = PRBG('pw', 'cd', '3')
+    legacy = PRBG('pw', 'cd', '3')
+    for prbg in (fast, legacy):
+        prbg.buffer.add(prbg.next_byte())
+    fast.setup()
+    legacy._setup_legacy()
+    assert int(fast.seed) == int(legacy.seed)
+    assert [int(b) for b in fast.buffer.buffer] == [int(b) for b in legacy.buffer.buffer]
+
+
+class Interrupt(Exception):
+    pass
+
+
+def interrupt(iteration, iteration_count, searched):
+    raise Interrupt
+
+
+@pytest.mark.parametrize("keep_checkpoint", [False, True])
+def test_setup_checkpoint(tmp_path, keep_checkpoint):
+    # An interrupted setup leaves its checkpoint, which is resumed, then removed unless it is kept
+    checkpoint = tmp_path / "setup.json"
+    prbg = PRBG('pw', 'cd', '3')
+    with pytest.raises(Interrupt):
+        prbg.setup(checkpoint=checkpoint, checkpoint_interval=0, progress=interrupt)
+    assert checkpoint.exists()
+    prbg = PRBG('pw', 'cd', '3')
+    prbg.setup(checkpoint=checkpoint, keep_checkpoint=keep_checkpoint)
+    assert int(prbg.seed) == 532212648
+    assert checkpoint.exists() == keep_checkpoint
@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+from derive import Keyring
+import prbg
+import sys
+import pytest
+
+
+@pytest.fixture
+def empty_caches():
+    '''
+    Empties the jump matrix caches, so that the threads of the test build them concurrently, and
+    switches threads as often as possible.
+    '''
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    prbg._jump_matrices.clear()
+    prbg._jump_tables.clear()
+    prbg.GENERATORS['v3'].matrices.clear()
+    yield
+    sys.setswitchinterval(interval)
+
+
+def run_threads(function, count=8):
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        return list(executor.map(lambda _: function(), range(count)))
+
+
+def set_up():
+    generator = prbg.PRBG('ola', 'ab', '2')
+    generator.setup()
+    return generator.seed
+
+
+def test_concurrent_setups(empty_caches):
+    seeds = run_threads(set_up)
+    assert seeds == [3858403428] * len(seeds)
+    # The caches built by the threads are still right
+    assert set_up() == 3858403428
+
+
+def test_concurrent_keyring_jumps(empty_caches):
+    seeds = run_threads(lambda: Keyring('ola', 'o', '2', 512).seed(10 ** 6))
+    prbg._jump_matrices.clear()
+    expected = Keyring('ola', 'o', '2', 512).seed(10 ** 6)
+    assert seeds == [expected] * len(seeds)
+
+
+def test_concurrent_xoshiro_jumps(empty_caches):
+    def seek():
+        stream = prbg.PRBGStream(prbg.PRBG('ola', 'o', '2', version='v3'))
+        stream.seek(10 ** 9)
+        return stream.read(16)
+
+    results = run_threads(seek)
+    prbg.GENERATORS['v3'].matrices.clear()
+    assert results == [seek()] * len(results)
@@ -0,0 +1,61 @@
+from prbg import PRBG, PRBGStream
+from pkcs1 import KeystoreWriter, read_keystore
+import struct
+import pytest
+
+VERSIONS = ['v2', 'v3']
+
+
+@pytest.mark.parametrize("version", VERSIONS)
+@pytest.mark.parametrize("confusion_string, iteration_count", [('o', 1), ('o', 5), ('ab', 1), ('cd', 2)])
+def test_setup_matches_legacy(version, confusion_string, iteration_count):
+    fast = PRBG('ola', confusion_string, str(iteration_count), version=version)
+    fast.setup()
+    legacy = PRBG('ola', confusion_string, str(iteration_count), version=version)
+    legacy._setup_legacy()
+    assert fast.seed == legacy.seed
+    assert fast.next_bytes(64) == bytes(legacy.next_byte() for _ in range(64))
+
+
+@pytest.mark.parametrize("version", VERSIONS)
+def test_setup_pattern_ends_on_a_step(version):
+    # Only matches that end at the end of a step count, so each iteration takes about as many steps as
+    # with v1 (256^2 for a 2-byte pattern), not 8 times less
+    steps = 0
+    for i in range(40):
+        prbg = PRBG(f'pw{i}', 'ab', '1', version=version)
+        prbg.setup()
+        assert prbg.bytes_searched % 8 == 0
+        steps += prbg.bytes_searched // 8
+    assert steps / 40 > 256 ** 2 / 4
+
+
+@pytest.mark.parametrize("version", VERSIONS)
+def test_fill_jump_and_stream_agree(version):
+    prbg = PRBG('ola', 'o', '2', version=version)
+    prbg.setup()
+    stream = PRBGStream(prbg)
+    reference = prbg.next_bytes(5000)
+    for offset, size in [(0, 1), (3, 5), (7, 9), (8, 8), (1001, 77), (4000, 1000)]:
+        stream.seek(offset)
+        assert stream.read(size) == reference[offset:offset + size]
+
+
+def test_der_keystore_records_versions(tmp_path):
+    path = tmp_path / "keys.der"
+    with KeystoreWriter(path, 'der') as keystore:
+        keystore.add_der('a', b'pub-a', b'priv-a', 'v2')
+    with KeystoreWriter(path, 'der') as keystore:
+        keystore.add_der('b', b'pub-b', b'priv-b')
+    assert list(read_keystore(path, 'der', versions=True)) == [('a', b'pub-a', b'priv-a', 'v2'), ('b', b'pub-b', b'priv-b', None)]
+    assert list(read_keystore(path, 'der')) == [('a', b'pub-a', b'priv-a'), ('b', b'pub-b', b'priv-b')]
+
+
+def test_der_keystore_without_versions(tmp_path):
+    path = tmp_path / "old.der"
+    with open(path, "wb") as f:
+        for field in (b'a', b'pub-a', b'priv-a'):
+            f.write(struct.pack('>I', len(field)) + field)
+    assert list(read_keystore(path, 'der', versions=True)) == [('a', b'pub-a', b'priv-a', None)]
+    with pytest.raises(ValueError):
+        KeystoreWriter(path, 'der')
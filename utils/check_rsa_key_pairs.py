@@ -0,0 +1,201 @@
+import argparse
+import base64
+import binascii
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import gmpy2
+from gmpy2 import mpz
+
+'''
+Message used for the encrypt/decrypt round trip of each key pair.
+'''
+PLAINTEXT = int.from_bytes("Viva Criptografia Alpicada!".encode('utf8'), byteorder='big')
+
+
+def main():
+    '''
+    This application verifies many RSA key pairs (PKCS#1, PEM encoded) at once, as produced by rsagen,
+    derive or batch, instead of one pair at a time. The pairs are given as directories (every
+    <name>_priv_key.pem with its <name>_pub_key.pem) and/or manifest files (one pair per line, either
+    "PUB PRIV" or a JSON object with the "pub" and "priv" paths and an optional "name"). Each pair is
+    checked on a pool of worker processes, directly on the key integers with gmpy2: n = p*q, p and q
+    are distinct probable primes, e*d = 1 mod lcm(p-1, q-1), the CRT exponents and coefficient, the
+    public key matches the private one, and an encrypt/decrypt round trip. The report is JSON, and the
+    program fails if any pair is invalid.
+    '''
+
+    # Argument parser
+    parser = argparse.ArgumentParser(description='Deterministic RSA key generation (D-RSA): batch RSA key pair checker')
+    parser.add_argument('paths', type=str, nargs='*', help='directories with key pairs')
+    parser.add_argument('--manifest', type=str, action='append', default=[], help='file listing key pairs (may be repeated)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    parser.add_argument('--report', type=str, help='file where the JSON report is saved (default: stdout)')
+    args = parser.parse_args()
+
+    pairs = []
+    for path in args.paths:
+        pairs += find_pairs(path)
+    for manifest in args.manifest:
+        pairs += read_manifest(manifest)
+    if not pairs:
+        parser.error("no key pairs found")
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        results = list(executor.map(check_pair, pairs, chunksize=max(1, min(64, len(pairs) // (4 * (args.jobs or 1))))))
+    failed = sum(not result['ok'] for result in results)
+    report = {'checked': len(results), 'failed': failed, 'results': results}
+
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    print(f"{len(results)} key pairs checked, {failed} failed", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+def find_pairs(folder):
+    '''
+    Lists the key pairs of a directory: (name, public key path, private key path) for every
+    <name>_priv_key.pem file.
+    '''
+    pairs = []
+    for priv in sorted(glob.glob(os.path.join(glob.escape(folder), "*_priv_key.pem"))):
+        name = os.path.basename(priv)[:-len("_priv_key.pem")]
+        pairs.append((name, os.path.join(folder, f"{name}_pub_key.pem"), priv))
+    return pairs
+
+
+def read_manifest(path):
+    '''
+    Lists the key pairs of a manifest file, whose relative paths are relative to the manifest itself.
+    '''
+    folder = os.path.dirname(path)
+    pairs = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                pub, priv = entry['pub'], entry['priv']
+                name = entry.get('name', priv)
+            else:
+                pub, priv = line.split()
+                name = priv
+            pairs.append((name, os.path.join(folder, pub), os.path.join(folder, priv)))
+    return pairs
+
+
+def check_pair(pair):
+    '''
+    Checks one key pair, returning its report: the result of each check, and whether all passed (or
+    the error that prevented the checks).
+    '''
+    name, pub, priv = pair
+    result = {'name': name, 'pub': pub, 'priv': priv}
+    try:
+        with open(pub, "rb") as f:
+            public = read_pem(f.read(), b"RSA PUBLIC KEY")
+        with open(priv, "rb") as f:
+            private = read_pem(f.read(), b"RSA PRIVATE KEY")
+        if len(public) != 2 or len(private) != 9:
+            raise ValueError("unexpected number of fields in the keys")
+        checks = check_key(public, private)
+        result['bits'] = int(private[1].bit_length())
+        result['checks'] = checks
+        result['ok'] = all(checks.values())
+    except (OSError, ValueError) as e:
+        result['ok'] = False
+        result['error'] = str(e)
+    return result
+
+
+def check_key(public, private):
+    '''
+    Checks the algebra of a key pair, given the integers of the public key (n, e) and of the private
+    key (version, n, e, d, p, q, dP, dQ, qInv).
+    '''
+    pub_n, pub_e = (mpz(x) for x in public)
+    version, n, e, d, p, q, dp, dq, qinv = (mpz(x) for x in private)
+    checks = {
+        'version': version == 0,
+        'public_key': pub_n == n and pub_e == e,
+        'modulus': gmpy2.mul(p, q) == n,
+        'distinct_primes': p != q,
+        'p_prime': gmpy2.is_prime(p, 25),
+        'q_prime': gmpy2.is_prime(q, 25)
+    }
+    if not (p > 1 and q > 1 and e > 0 and d > 0):
+        checks['exponents'] = False
+        return checks
+    lam = gmpy2.lcm(p - 1, q - 1)
+    checks['exponents'] = gmpy2.f_mod(e * d, lam) == 1
+    checks['crt_exponents'] = dp == gmpy2.f_mod(d, p - 1) and dq == gmpy2.f_mod(d, q - 1)
+    checks['crt_coefficient'] = gmpy2.f_mod(qinv * q, p) == 1
+    if PLAINTEXT < n:
+        checks['round_trip'] = gmpy2.powmod(gmpy2.powmod(PLAINTEXT, e, n), d, n) == PLAINTEXT
+    return checks
+
+
+def read_pem(data, marker):
+    '''
+    Decodes a PEM block with the given marker (e.g. b"RSA PRIVATE KEY"), and returns the integers of
+    its DER SEQUENCE.
+    '''
+    begin = b"-----BEGIN " + marker + b"-----"
+    end = b"-----END " + marker + b"-----"
+    start = data.find(begin)
+    stop = data.find(end, start)
+    if start < 0 or stop < 0:
+        raise ValueError(f"no {marker.decode()} PEM block found")
+    try:
+        der = base64.b64decode(b"".join(data[start + len(begin):stop].split()), validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"invalid PEM encoding: {e}")
+    return read_der_integers(der)
+
+
+def read_der_integers(der):
+    '''
+    Decodes a DER SEQUENCE of INTEGERs (such as a PKCS#1 RSAPublicKey or RSAPrivateKey) to a list of ints.
+    '''
+    tag, content, rest = read_der(der)
+    if tag != 0x30 or rest:
+        raise ValueError("expected a single DER SEQUENCE")
+    integers = []
+    while content:
+        tag, value, content = read_der(content)
+        if tag != 0x02 or not value:
+            raise ValueError("expected a DER INTEGER")
+        integers.append(int.from_bytes(value, byteorder='big', signed=True))
+    return integers
+
+
+def read_der(data):
+    '''
+    Reads one DER element (single byte tag), returning its tag, content and the remaining bytes.
+    '''
+    if len(data) < 2:
+        raise ValueError("truncated DER element")
+    tag, length, position = data[0], data[1], 2
+    if length & 0x80:
+        size = length & 0x7F
+        if size == 0 or len(data) < position + size:
+            raise ValueError("invalid DER length")
+        length = int.from_bytes(data[position:position + size], byteorder='big')
+        position += size
+    if len(data) < position + length:
+        raise ValueError("truncated DER element")
+    return tag, data[position:position + length], data[position + length:]
+
+
+if __name__ == "__main__":
+    main()